@@ -0,0 +1,128 @@
+# ===================================================================================
+# === backends.py                                                                 ===
+# === Storage, document-store and model-client interfaces, and the Google         ===
+# === implementations used in production (connected lazily, on first use)         ===
+# ===================================================================================
+
+import abc
+import threading
+from dataclasses import dataclass
+from urllib.parse import quote
+
+
+class StorageBackend(abc.ABC):
+    """Where the encoded images go."""
+
+    @abc.abstractmethod
+    def upload(self, blob_path: str, data: bytes, content_type: str, cache_control: str | None = None) -> str:
+        """Stores `data` at `blob_path` and returns its public URL."""
+
+
+class DocumentStore(abc.ABC):
+    """The part of the Firestore client API the pipeline uses.
+
+    collection(name) returns references supporting document(), list_documents(),
+    stream() and select(); document references support get(), set(), delete() and
+    collection(). `SERVER_TIMESTAMP` is the value to store for "now".
+    """
+
+    SERVER_TIMESTAMP = None
+
+    @abc.abstractmethod
+    def collection(self, name: str): ...
+
+    @abc.abstractmethod
+    def batch(self): ...
+
+    @abc.abstractmethod
+    def get_all(self, references): ...
+
+
+class ModelClient(abc.ABC):
+    """Runs a generative model request and returns a response shaped like Gemini's
+    (.text, .candidates[0].content.parts, .usage_metadata)."""
+
+    @abc.abstractmethod
+    def generate(self, model_name: str, contents: list, tools: list | None = None, generation_config: dict | None = None,
+                 timeout: float | None = None): ...
+
+    @abc.abstractmethod
+    def function_response(self, name: str, response: dict):
+        """The content part that answers a tool call with `response`."""
+
+
+@dataclass
+class Backends:
+    store: DocumentStore
+    storage: StorageBackend
+    model: ModelClient
+    name: str = "custom"
+
+
+# --- Google implementations ---
+class FirebaseStorageBackend(StorageBackend):
+    def __init__(self, bucket, bucket_name: str):
+        self.bucket = bucket
+        self.bucket_name = bucket_name
+
+    def upload(self, blob_path: str, data: bytes, content_type: str, cache_control: str | None = None) -> str:
+        blob = self.bucket.blob(blob_path)
+        blob.cache_control = cache_control
+        blob.upload_from_string(data, content_type=content_type)
+        return f"https://firebasestorage.googleapis.com/v0/b/{self.bucket_name}/o/{quote(blob_path, safe='')}?alt=media"
+
+
+class FirestoreDocumentStore(DocumentStore):
+    """Thin pass-through to a firebase_admin Firestore client."""
+
+    def __init__(self, client):
+        from firebase_admin import firestore
+        self.client = client
+        self.SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+
+    def collection(self, name: str):
+        return self.client.collection(name)
+
+    def batch(self):
+        return self.client.batch()
+
+    def get_all(self, references):
+        return self.client.get_all(references)
+
+
+class GeminiModelClient(ModelClient):
+    """google-generativeai, imported and configured on the first request."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._genai = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+            return self._genai
+
+    def generate(self, model_name: str, contents: list, tools: list | None = None, generation_config: dict | None = None,
+                 timeout: float | None = None):
+        genai = self._client()
+        model = genai.GenerativeModel(model_name=model_name, tools=tools, generation_config=generation_config)
+        return model.generate_content(contents, request_options={"timeout": timeout} if timeout else None)
+
+    def function_response(self, name: str, response: dict):
+        genai = self._client()
+        return genai.protos.Part(function_response=genai.protos.FunctionResponse(name=name, response=response))
+
+
+def google_backends(service_account_path: str, bucket_name: str, gemini_api_key: str) -> Backends:
+    """Initialises Firebase (once per process) and returns the production backends."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(service_account_path)
+        firebase_admin.initialize_app(cred, {'storageBucket': bucket_name})
+    return Backends(store=FirestoreDocumentStore(firestore.client()), storage=FirebaseStorageBackend(storage.bucket(), bucket_name),
+                    model=GeminiModelClient(gemini_api_key), name="google")
@@ -0,0 +1,73 @@
+# ===================================================================================
+# === benchmarks/blurhash_benchmark.py                                            ===
+# === Compares blurhash_encoder against the blurhash-python library               ===
+# === Usage: python benchmarks/blurhash_benchmark.py [image paths or URLs...]     ===
+# === (needs `pip install blurhash-python`; defaults to the links in              ===
+# === frontpages.json)                                                            ===
+# ===================================================================================
+
+import json
+import os
+import sys
+import time
+from io import BytesIO
+
+import blurhash
+from PIL import Image
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+import blurhash_encoder  # noqa: E402
+import http_client  # noqa: E402
+
+X_COMPONENTS, Y_COMPONENTS = 4, 3
+
+
+def load_samples(sources: list[str]) -> list[tuple[str, bytes]]:
+    if not sources:
+        with open(os.path.join(ROOT_DIR, "frontpages.json"), "r", encoding="utf-8") as f:
+            sources = [item["link"] for item in json.load(f).get("items", [])]
+    samples = []
+    for source in sources:
+        try:
+            if source.startswith("http"):
+                resp = http_client.get(source, kind="image"); resp.raise_for_status(); data = resp.content
+            else:
+                with open(source, "rb") as f: data = f.read()
+            samples.append((os.path.basename(source), data))
+        except Exception as e:
+            print(f"⚠️ Skipping {source}: {e}")
+    return samples
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat): result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    samples = load_samples(sys.argv[1:])
+    if not samples: print("No sample front pages available."); return
+    totals = {"library_full": 0.0, "library_thumb": 0.0, "numpy": 0.0}
+    identical = 0
+    print(f"{'image':<40} {'size':>11} {'lib full':>10} {'lib thumb':>10} {'numpy':>10}  same-hash")
+    for name, data in samples:
+        with Image.open(BytesIO(data)) as img: img_rgb = img.convert('RGB')
+        thumb = img_rgb.copy(); thumb.thumbnail((blurhash_encoder.WORKING_EDGE,) * 2, Image.BILINEAR, reducing_gap=2.0)
+        # blurhash.encode closes the image it's given, hence the copies.
+        _, lib_full = timed(lambda: blurhash.encode(img_rgb.copy(), X_COMPONENTS, Y_COMPONENTS))
+        lib_hash, lib_thumb = timed(lambda: blurhash.encode(thumb.copy(), X_COMPONENTS, Y_COMPONENTS), repeat=10)
+        np_hash, np_time = timed(lambda: blurhash_encoder.encode(img_rgb, X_COMPONENTS, Y_COMPONENTS), repeat=10)
+        assert blurhash.is_valid_blurhash(np_hash), np_hash
+        blurhash.decode(np_hash, 32, 32)  # The app's decoder must accept it.
+        same = np_hash == lib_hash; identical += same
+        totals["library_full"] += lib_full; totals["library_thumb"] += lib_thumb; totals["numpy"] += np_time
+        print(f"{name[:40]:<40} {'%dx%d' % img_rgb.size:>11} {lib_full * 1000:>8.1f}ms {lib_thumb * 1000:>8.2f}ms {np_time * 1000:>8.2f}ms  {same}")
+    print(f"\nTotals over {len(samples)} images: library (full-res) {totals['library_full']:.2f}s, "
+          f"library (thumbnail) {totals['library_thumb']:.3f}s, numpy (incl. resize) {totals['numpy']:.3f}s")
+    print(f"Identical hashes on the same working image: {identical}/{len(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# ===================================================================================
+# === benchmarks/fakes.py                                                         ===
+# === Stand-ins for the site, Gemini, Custom Search, Firestore and Storage, each  ===
+# === with a configurable latency, so the pipeline runs offline                   ===
+# ===================================================================================
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backends import Backends, StorageBackend  # noqa: E402
+from local_backends import CannedModelClient, LocalDocumentStore, LocalSnapshot, canned_response  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SOURCE_PAGE_FIXTURE = os.path.join(FIXTURES_DIR, "tomorrowspapers.html")
+SAMPLE_PAGE_SIZE = (1000, 1600)  # Roughly the size of the scans on tomorrowspapers.co.uk
+
+
+@dataclass
+class Latency:
+    """Seconds each fake call sleeps for; `scale` multiplies all of them."""
+    page: float = 0.15
+    image_download: float = 0.05
+    gemini_pro: float = 0.4
+    gemini_flash: float = 0.2
+    search: float = 0.1
+    storage_upload: float = 0.03
+    firestore_read: float = 0.01
+    firestore_commit: float = 0.03
+    scale: float = 1.0
+
+    def sleep(self, name: str):
+        seconds = getattr(self, name) * self.scale
+        if seconds > 0: time.sleep(seconds)
+
+
+def sample_front_page(seed: int, size: tuple[int, int] = SAMPLE_PAGE_SIZE) -> bytes:
+    """A deterministic JPEG laid out like a front page: masthead, photo blocks and text lines."""
+    rng = random.Random(seed)
+    width, height = size
+    img = Image.new("RGB", size, (250, 248, 242))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width, height // 9), fill=tuple(rng.randrange(256) for _ in range(3)))
+    y = height // 8
+    while y < height - 40:
+        if rng.random() < 0.3:
+            block = rng.randrange(height // 10, height // 4)
+            draw.rectangle((30, y, width - 30, min(y + block, height - 30)), fill=tuple(rng.randrange(40, 220) for _ in range(3)))
+            for _ in range(40):
+                x0, y0 = rng.randrange(30, width - 60), rng.randrange(y, min(y + block, height - 30))
+                draw.ellipse((x0, y0, x0 + rng.randrange(10, 80), y0 + rng.randrange(10, 80)), fill=tuple(rng.randrange(256) for _ in range(3)))
+            y += block + 20
+        else:
+            line_height = rng.choice((14, 14, 14, 40))
+            for column in range(3):
+                left = 30 + column * (width - 60) // 3
+                draw.rectangle((left, y, left + rng.randrange((width - 60) // 4, (width - 60) // 3 - 10), y + line_height - 6), fill=(30, 30, 30))
+            y += line_height
+    out = BytesIO()
+    img.save(out, "JPEG", quality=88)
+    return out.getvalue()
+
+
+class FakeResponse:
+    """Just enough of requests.Response for http_client callers."""
+
+    def __init__(self, url: str, content: bytes = b"", status_code: int = 200, headers: dict | None = None):
+        self.url, self.content, self.status_code, self.headers = url, content, status_code, headers or {}
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400: raise RuntimeError(f"{self.status_code} for {self.url}")
+
+
+class FakeWeb:
+    """Serves the saved source page, generated scans and canned search results in place of http_client.get."""
+
+    def __init__(self, latency: Latency, page_html: bytes | None = None, images: dict[str, bytes] | None = None):
+        self.latency = latency
+        if page_html is None:
+            with open(SOURCE_PAGE_FIXTURE, "rb") as f: page_html = f.read()
+        self.page_html = page_html
+        self.images = images or {}
+        self.requests = 0
+
+    def get(self, url: str, kind: str = "default", max_bytes: int | None = None, **kwargs) -> FakeResponse:
+        self.requests += 1
+        if "googleapis.com/customsearch" in url:
+            self.latency.sleep("search")
+            query = (kwargs.get("params") or {}).get("q", "")
+            items = [{"snippet": f"Latest coverage of {query} ... result {n}."} for n in range(3)]
+            return FakeResponse(url, json.dumps({"items": items}).encode())
+        if url in self.images:
+            self.latency.sleep("image_download")
+            return FakeResponse(url, self.images[url], headers={"Content-Type": "image/jpeg"})
+        if kind == "page":
+            self.latency.sleep("page")
+            return FakeResponse(url, self.page_html, headers={"Content-Type": "text/html"})
+        return FakeResponse(url, b"", status_code=404)
+
+
+# --- Gemini ---
+class FakeModelClient(CannedModelClient):
+    """Canned answers after a Gemini-like delay, with token counts that grow with the image.
+
+    The analysis model asks for one google_search call before answering, like the real one
+    usually does, so the search round trip is part of the measurement.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.calls = {"pro": 0, "flash": 0}
+        self._lock = threading.Lock()
+
+    def generate(self, model_name: str, contents: list, tools: list | None = None, generation_config: dict | None = None,
+                 timeout: float | None = None):
+        tier = "flash" if "flash" in model_name else "pro"
+        with self._lock: self.calls[tier] += 1
+        self.latency.sleep(f"gemini_{tier}")
+        image_bytes = sum(len(part.get("data", b"")) for part in contents if isinstance(part, dict) and "data" in part)
+        tokens = {"prompt_tokens": 258 + image_bytes // 4096, "output_tokens": 400}
+        if tools and len(contents) == 2:
+            call = SimpleNamespace(name="google_search", args={"query": f"front page headline {image_bytes}"})
+            return canned_response("", function_call=call, **tokens)
+        response = super().generate(model_name, contents, tools, generation_config, timeout)
+        return canned_response(response.text, **tokens)
+
+
+# --- Firestore ---
+class FakeDocumentStore(LocalDocumentStore):
+    """An in-memory LocalDocumentStore that waits like Firestore on every read and commit."""
+
+    def __init__(self, latency: Latency):
+        super().__init__(":memory:")
+        self.latency = latency
+        self.commits = 0
+
+    def read(self, path: str):
+        self.latency.sleep("firestore_read")
+        return super().read(path)
+
+    def ids(self, parent: str):
+        self.latency.sleep("firestore_read")
+        return super().ids(parent)
+
+    def documents(self, parent: str):
+        self.latency.sleep("firestore_read")
+        return super().documents(parent)
+
+    def get_all(self, references):
+        self.latency.sleep("firestore_read")  # One round trip for the lot
+        return [LocalSnapshot(reference, LocalDocumentStore.read(self, reference.path)) for reference in references]
+
+    def apply(self, operations):
+        self.latency.sleep("firestore_commit")
+        self.commits += 1
+        super().apply(operations)
+
+
+# --- Storage ---
+class FakeStorage(StorageBackend):
+    """Keeps only the size, type and caching header of each upload."""
+
+    def __init__(self, latency: Latency):
+        self.latency, self.blobs, self._lock = latency, {}, threading.Lock()
+
+    def upload(self, blob_path: str, data: bytes, content_type: str, cache_control: str | None = None) -> str:
+        self.latency.sleep("storage_upload")
+        with self._lock: self.blobs[blob_path] = (len(data), content_type, cache_control)
+        return f"https://storage.example.invalid/{blob_path}"
+
+    @property
+    def bytes_uploaded(self) -> int:
+        return sum(size for size, _, _ in self.blobs.values())
+
+
+def fake_backends(latency: Latency) -> Backends:
+    """Fresh, empty store/storage/model stand-ins to pass to process_items(backends=...)."""
+    return Backends(store=FakeDocumentStore(latency), storage=FakeStorage(latency), model=FakeModelClient(latency), name="fake")
+
+
+def install(latency: Latency) -> FakeWeb:
+    """Routes http_client.get (the site, image downloads, Custom Search) to a FakeWeb."""
+    import http_client
+    web = FakeWeb(latency)
+    http_client.get = web.get
+    return web
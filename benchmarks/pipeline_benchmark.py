@@ -0,0 +1,198 @@
+# ===================================================================================
+# === benchmarks/pipeline_benchmark.py                                            ===
+# === Times the scraper, feed writers, image stage and full process_items runs    ===
+# === offline, against the saved page and the fakes in benchmarks/fakes.py        ===
+# === Usage: python benchmarks/pipeline_benchmark.py [--sizes 10,50,200]          ===
+# ===        [--latency-scale 1.0] [--output report.json] [--compare base.json]   ===
+# ===================================================================================
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+import fakes  # noqa: E402
+import instrumentation  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+REPORT_SCHEMA = 1
+SAMPLE_COUNT = 12  # Distinct generated scans, cycled over the papers of a run
+TITLES = ["Guardian", "Independent", "Daily Telegraph", "FT Weekend", "Daily Express", "Times", "Daily Star", "i weekend",
+          "Daily Mirror", "Daily Mail", "Sun", "Metro", "Observer", "Scotsman", "Herald", "Yorkshire Post"]
+
+
+def timed(fn, repeat: int) -> dict:
+    """Runs `fn` `repeat` times and summarises the wall-clock seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter(); fn(); runs.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(runs), "min": min(runs), "max": max(runs), "runs": repeat}
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def feed_items(count: int) -> list[tuple[str, str]]:
+    return [(f"{TITLES[i % len(TITLES)]} {i}", f"https://www.tomorrowspapers.co.uk/wp-content/uploads/bench/paper-{i}.jpg") for i in range(count)]
+
+
+def bench_scraper(results: dict, repeat: int):
+    import generate
+    results["scrape.get_tomorrows_papers_front_pages"] = timed(generate.get_tomorrows_papers_front_pages, repeat)
+    results["scrape.get_front_pages"] = timed(generate.get_front_pages, repeat)
+    # A page with many more images than the real one, to see how the single pass scales.
+    with open(fakes.SOURCE_PAGE_FIXTURE, "rb") as f: page = f.read()
+    marker = b'<div class="gallery gallery-columns-3 gallery-size-large">'
+    start = page.index(marker) + len(marker); gallery = page[start:page.index(b"</div>", start)]
+    big_page = page[:start] + gallery * 20 + page[start:]
+    results["scrape.parse_front_pages[20x]"] = timed(lambda: generate.parse_front_pages(big_page), repeat)
+
+
+def bench_feeds(results: dict, sizes: list[int], repeat: int):
+    import feeds
+    import generate
+    for size in sizes:
+        items = feed_items(size)
+        results[f"feeds.generate_rss[{size}]"] = timed(lambda: generate.generate_rss(items, generate.SOURCE_URL), repeat)
+        results[f"feeds.generate_json[{size}]"] = timed(lambda: generate.generate_json(items, generate.SOURCE_URL, "https://example.invalid/rss.xml"), repeat)
+        with tempfile.TemporaryDirectory() as directory, contextlib.chdir(directory):
+            json_feed = generate.build_json_feed(items, generate.SOURCE_URL, "https://example.invalid/rss.xml")
+            results[f"feeds.write_feeds[{size}]"] = timed(lambda: feeds.write_feeds(items, generate.SOURCE_URL, json_feed), repeat)
+
+
+def bench_images(results: dict, samples: list[bytes], repeat: int):
+    from PIL import Image
+
+    import blurhash_encoder
+    import image_processing
+
+    def decode():
+        for data in samples:
+            with Image.open(io.BytesIO(data)) as img: img.convert('RGB')
+
+    decoded = []
+    for data in samples:
+        with Image.open(io.BytesIO(data)) as img: decoded.append(img.convert('RGB'))
+    thumbnails = []
+    for img in decoded:
+        thumb = img.copy(); thumb.thumbnail((image_processing.BLURHASH_THUMBNAIL_EDGE,) * 2, Image.BILINEAR, reducing_gap=2.0); thumbnails.append(thumb)
+    per_image = {"per_image": len(samples)}
+    stages = {
+        "image.decode": decode,
+        "image.render_renditions": lambda: [image_processing.render_renditions(img) for img in decoded],
+        "image.blurhash": lambda: [blurhash_encoder.encode(thumb, *image_processing.BLURHASH_COMPONENTS) for thumb in thumbnails],
+        "image.render_variants": lambda: [image_processing.render_variants(data) for data in samples],
+        "image.downscale_for_model": lambda: [image_processing.downscale_for_model(data, 1600, 80) for data in samples],
+    }
+    for name, fn in stages.items():
+        result = timed(fn, repeat)
+        results[name] = {**result, **per_image, "seconds_per_image": result["seconds"] / len(samples)}
+
+
+def bench_process_items(results: dict, latency, uploader, web, samples: list[bytes], sizes: list[int], verbose: bool):
+    from upload_to_static_newspaper_details_collection import NEWSPAPER_DATA
+    pub_date = datetime.now(timezone.utc).strftime("%Y-%m-%d 21:00:00")
+    for size in sizes:
+        backends = fakes.fake_backends(latency)
+        seed = [(f"{uploader.DETAILS_COLLECTION_NAME}/{doc_id}", details, False) for doc_id, details in NEWSPAPER_DATA.items()]
+        seed += [(f"{uploader.COLLECTION_NAME}/light-previous-{i}", {"title": "previous"}, False) for i in range(size)]  # Last night's docs
+        backends.store.apply(seed); backends.store.commits = 0
+        items = []
+        for i, (title, url) in enumerate(feed_items(size)):
+            web.images[url] = samples[i % len(samples)]
+            items.append({"title": title, "link": url, "pubDate": pub_date})
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        run = instrumentation.reset()
+        start = time.perf_counter()
+        with output: processed = uploader.process_items(items, backends=backends)
+        seconds = time.perf_counter() - start
+        results[f"pipeline.process_items[{size}]"] = {
+            "seconds": seconds, "runs": 1, "papers": size, "seconds_per_paper": seconds / size,
+            "published": sum(1 for result in processed if result and result.get('documents')),
+            "gemini_calls": dict(backends.model.calls), "firestore_commits": backends.store.commits,
+            "blobs_uploaded": len(backends.storage.blobs), "bytes_uploaded": backends.storage.bytes_uploaded,
+            "stages": run.stage_summary(),
+        }
+        print(f"   process_items[{size}]: {seconds:.2f}s ({seconds / size:.3f}s per paper)")
+
+
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f: baseline = json.load(f)
+    print(f"\n{'benchmark':<42} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name, {}).get("seconds")
+        change = f"{result['seconds'] / before:.2f}x" if before else "new"
+        print(f"{name:<42} {before if before is not None else float('nan'):>10.4f} {result['seconds']:>10.4f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the scrape → process → publish pipeline.")
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated paper counts for the full runs")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions for the micro-benchmarks (median is reported)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the fake network latencies (0 = none)")
+    parser.add_argument("--extraction-mode", choices=("combined", "separate"), default="separate")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only run the scraper, feed and image benchmarks")
+    parser.add_argument("--output", help="report path (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    latency = fakes.Latency(scale=args.latency_scale)
+    os.environ["GEMINI_CACHE"] = "off"  # Every run should pay for its model calls.
+    os.environ["GEMINI_EXTRACTION_MODE"] = args.extraction_mode
+    web = fakes.install(latency)
+    print(f"Generating {SAMPLE_COUNT} sample front pages ({fakes.SAMPLE_PAGE_SIZE[0]}x{fakes.SAMPLE_PAGE_SIZE[1]})…")
+    samples = [fakes.sample_front_page(seed) for seed in range(SAMPLE_COUNT)]
+
+    results = {}
+    # Micro-benchmarks measure CPU work, so the fake network answers instantly for them.
+    latency.scale = 0
+    print("Timing the scraper, feed writers and image stage…")
+    bench_scraper(results, args.repeat)
+    bench_feeds(results, sizes, args.repeat)
+    bench_images(results, samples, args.repeat)
+    latency.scale = args.latency_scale
+    if not args.skip_pipeline:
+        print("Timing full process_items runs…")
+        import upload_news_images_create_documents_fields as uploader
+        bench_process_items(results, latency, uploader, web, samples, sizes, args.verbose)
+
+    report = {
+        "schema": REPORT_SCHEMA, "created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "git": git_revision(),
+        "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        "config": {"sizes": sizes, "repeat": args.repeat, "extraction_mode": args.extraction_mode,
+                   "sample_page_size": list(fakes.SAMPLE_PAGE_SIZE), "latency": {**asdict(latency), "scale": args.latency_scale}},
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(report['git']['commit'] or 'nogit')[:10]}.json")
+    with open(output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    print(f"\n{'benchmark':<42} {'seconds':>10}")
+    for name, result in results.items(): print(f"{name:<42} {result['seconds']:>10.4f}")
+    print(f"\nReport written to {output}")
+    if args.compare: compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# ===================================================================================
+# === blurhash_encoder.py                                                         ===
+# === Vectorised NumPy Blurhash encoder (same output format as blurhash-python)   ===
+# ===================================================================================
+
+from functools import lru_cache
+import math
+
+import numpy as np
+from PIL import Image
+
+# The image is shrunk to at most this many pixels per side before the basis sums.
+WORKING_EDGE = 64
+BASE83_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+# sRGB byte → linear light, computed once for all 256 values.
+_SRGB_TO_LINEAR = np.array(
+    [v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4 for v in (i / 255 for i in range(256))],
+    dtype=np.float64,
+)
+
+
+@lru_cache(maxsize=64)
+def _cosine_tables(width: int, height: int, x_components: int, y_components: int) -> tuple[np.ndarray, np.ndarray]:
+    """cos(pi * i * x / width) and cos(pi * j * y / height) tables for one working size."""
+    cos_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    cos_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    return cos_x, cos_y
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(BASE83_CHARS[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * math.pow(v, 1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def components(image: Image.Image, x_components: int = 4, y_components: int = 3,
+               working_edge: int = WORKING_EDGE) -> np.ndarray:
+    """Returns the (y_components, x_components, 3) DCT-style factors of `image`."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if max(image.size) > working_edge:
+        image = image.copy(); image.thumbnail((working_edge, working_edge), Image.BILINEAR, reducing_gap=2.0)
+    width, height = image.size
+    linear = _SRGB_TO_LINEAR[np.asarray(image, dtype=np.uint8)]  # (height, width, 3)
+    cos_x, cos_y = _cosine_tables(width, height, x_components, y_components)
+    # Sum over y then x as two matrix products instead of one cosine per pixel per component.
+    factors = np.einsum('jh,hwc,iw->jic', cos_y, linear, cos_x, optimize=True) / (width * height)
+    factors[1:, :, :] *= 2
+    factors[0, 1:, :] *= 2
+    return factors
+
+
+def encode(image: Image.Image, x_components: int = 4, y_components: int = 3, working_edge: int = WORKING_EDGE) -> str:
+    """Encodes a PIL image as a Blurhash string. Unlike blurhash.encode, `image` is left open."""
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError('Invalid x_components or y_components')
+    factors = components(image, x_components, y_components, working_edge).reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        actual_maximum = float(np.abs(ac).max())
+        quantised_maximum = int(max(0, min(82, math.floor(actual_maximum * 166 - 0.5))))
+        maximum_value = (quantised_maximum + 1) / 166
+        result += _encode83(quantised_maximum, 1)
+    else:
+        maximum_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for r, g, b in ac:
+        quant = [int(max(0, min(18, math.floor(_sign_pow(c / maximum_value, 0.5) * 9 + 9.5)))) for c in (r, g, b)]
+        result += _encode83(quant[0] * 19 * 19 + quant[1] * 19 + quant[2], 2)
+    return result
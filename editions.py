@@ -0,0 +1,60 @@
+# ===================================================================================
+# === editions.py                                                                 ===
+# === Compact per-date edition manifests (editions/{YYYY-MM-DD}) so the app can   ===
+# === load a whole night's papers in one read                                     ===
+# ===================================================================================
+
+from publisher import commit_in_batches
+
+EDITIONS_COLLECTION_NAME = "editions"
+PAPERS_SUBCOLLECTION_NAME = "papers"  # editions/{date}/papers/{paper_id}: the bulky analysis + OCR
+DETAIL_FIELDS = ('ownedBy1', 'ownedBy2', 'ownedBy3', 'format', 'style', 'leaning', 'readershipDemographics')
+VARIANT_FIELDS = ('image', 'srcset', 'blurhash', 'aspect', 'width', 'height')
+
+
+def paper_id_for(doc_id: str, doc: dict) -> str:
+    """'light-Guardian' / 'dark-Guardian' → 'Guardian'."""
+    prefix = f"{doc.get('brightness')}-"
+    return doc_id[len(prefix):] if doc_id.startswith(prefix) else doc_id
+
+
+def build_editions(documents: dict[str, dict], dates: set[str]) -> dict[str, dict]:
+    """Groups the published light/dark docs by paper date, for the given `dates` only.
+
+    Returns {date: {'manifest': <compact edition doc>, 'papers': {paper_id: <analysis/OCR doc>}}}.
+    Docs without a `paperDate`, or dated outside `dates`, are left out.
+    """
+    editions = {}
+    for doc_id, doc in sorted(documents.items()):
+        paper_date = doc.get('paperDate')
+        if paper_date not in dates: continue
+        edition = editions.setdefault(paper_date, {'manifest': {'date': paper_date, 'dateOfPaper': doc.get('dateOfPaper'), 'papers': {}}, 'papers': {}})
+        paper_id = paper_id_for(doc_id, doc)
+        entry = edition['manifest']['papers'].setdefault(paper_id, {
+            'id': paper_id, 'title': doc.get('title'), 'pubDate': doc.get('pubDate'),
+            'details': {field: doc.get(field) for field in DETAIL_FIELDS},
+        })
+        entry[doc.get('brightness') or 'light'] = {field: doc.get(field) for field in VARIANT_FIELDS}
+        edition['papers'][paper_id] = {'title': doc.get('title'), 'analysis': doc.get('analysis'), 'ocr_text': doc.get('ocr_text')}
+    for edition in editions.values():
+        # Firestore keeps map order arbitrary, so the manifest stores an ordered list.
+        edition['manifest']['papers'] = sorted(edition['manifest']['papers'].values(), key=lambda entry: (entry['title'] or '').lower())
+        edition['manifest']['paperCount'] = len(edition['manifest']['papers'])
+    return editions
+
+
+def publish_editions(db, editions: dict[str, dict]) -> int:
+    """Writes each edition manifest and its per-paper docs, removing papers no longer in it.
+
+    Dates not in `editions` are never touched, so past editions stay browsable. `db` is a
+    backends.DocumentStore. Returns the number of batch commits.
+    """
+    operations = []
+    for paper_date, edition in editions.items():
+        edition_ref = db.collection(EDITIONS_COLLECTION_NAME).document(paper_date)
+        papers_ref = edition_ref.collection(PAPERS_SUBCOLLECTION_NAME)
+        operations.append(("set", edition_ref, {**edition['manifest'], 'updated': db.SERVER_TIMESTAMP}))
+        operations += [("set", papers_ref.document(paper_id), paper) for paper_id, paper in edition['papers'].items()]
+        stale_ids = {ref.id for ref in papers_ref.list_documents()} - set(edition['papers'])
+        operations += [("delete", papers_ref.document(paper_id), None) for paper_id in sorted(stale_ids)]
+    return commit_in_batches(db, operations)
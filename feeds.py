@@ -0,0 +1,170 @@
+# ===================================================================================
+# === feeds.py                                                                    ===
+# === Streaming RSS / JSON writers with a rolling multi-day archive               ===
+# ===================================================================================
+
+import glob
+import gzip
+import html
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import XMLGenerator
+
+FEED_TITLE = "UK Newspaper Front Pages - Tomorrow's Papers Today"
+FEED_DESCRIPTION = "Daily UK newspaper front pages from Tomorrow's Papers Today"
+ARCHIVE_DIR = "feed_archive"  # One RSS fragment + one JSON-lines shard per day
+ARCHIVE_DAYS = int(os.environ.get("FEED_ARCHIVE_DAYS", "7"))
+JSON_FEED_DIR = "feed"  # Paginated JSON Feed 1.1 over the archive
+JSON_FEED_PAGE_SIZE = 50
+PAGES_BASE_URL = "https://lak7474.github.io/frontpages-app-repo"
+
+
+def rfc822(moment: datetime) -> str:
+    return moment.strftime("%a, %d %b %Y %H:%M:%S +0000")
+
+
+def image_html(img_url: str, title: str) -> str:
+    return f'<img src="{html.escape(img_url)}" alt="{html.escape(title)}">'
+
+
+def _element(xml: XMLGenerator, name: str, text: str):
+    xml.startElement(name, {}); xml.characters(text); xml.endElement(name)
+
+
+def write_rss_items(out, items, pub_date: datetime):
+    """Streams <item> elements for (title, img_url) pairs; XMLGenerator does the escaping."""
+    xml = XMLGenerator(out, encoding="utf-8")
+    pub_date_str = rfc822(pub_date)
+    for title, img_url in items:
+        xml.startElement("item", {})
+        _element(xml, "title", title)
+        _element(xml, "link", img_url)
+        _element(xml, "description", image_html(img_url, title))
+        _element(xml, "guid", img_url)
+        _element(xml, "pubDate", pub_date_str)
+        xml.endElement("item")
+
+
+def write_rss(out, source_url: str, build_date: datetime, items=(), fragment_paths=()):
+    """Streams a complete RSS 2.0 document: `items` first, then pre-rendered archive fragments."""
+    xml = XMLGenerator(out, encoding="utf-8")
+    xml.startDocument()
+    xml.startElement("rss", {"version": "2.0"})
+    xml.startElement("channel", {})
+    _element(xml, "title", FEED_TITLE)
+    _element(xml, "link", source_url)
+    _element(xml, "description", FEED_DESCRIPTION)
+    _element(xml, "lastBuildDate", rfc822(build_date))
+    _element(xml, "language", "en-GB")
+    write_rss_items(out, items, build_date)
+    for path in fragment_paths:
+        with open(path, "r", encoding="utf-8") as fragment:
+            shutil.copyfileobj(fragment, out)  # Already escaped XML; copied without re-parsing.
+    xml.endElement("channel")
+    xml.endElement("rss")
+    xml.endDocument()
+    out.write("\n")
+
+
+def json_feed_item(title: str, img_url: str, pub_date: datetime) -> dict:
+    return {"id": img_url, "url": img_url, "title": title, "image": img_url,
+            "content_html": image_html(img_url, title), "date_published": pub_date.isoformat()}
+
+
+class FeedArchive:
+    """Per-day shards of already-rendered feed items.
+
+    Each run only rewrites today's shard; older days are streamed into the outputs
+    byte-for-byte, so generation cost doesn't grow with history.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR, days: int = ARCHIVE_DAYS):
+        self.directory = directory
+        self.days = days
+
+    def _path(self, day: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{day}.{ext}")
+
+    def update(self, items, pub_date: datetime):
+        """Replaces the shard for `pub_date`'s day and drops days older than the window."""
+        os.makedirs(self.directory, exist_ok=True)
+        day = pub_date.strftime("%Y-%m-%d")
+        with open(self._path(day, "rss"), "w", encoding="utf-8") as f:
+            write_rss_items(f, items, pub_date)
+        with open(self._path(day, "jsonl"), "w", encoding="utf-8") as f:
+            for title, img_url in items:
+                f.write(json.dumps(json_feed_item(title, img_url, pub_date), separators=(",", ":"), ensure_ascii=False) + "\n")
+        oldest = (pub_date - timedelta(days=self.days - 1)).strftime("%Y-%m-%d")
+        for path in glob.glob(os.path.join(self.directory, "*.*")):
+            if os.path.basename(path).split(".")[0] < oldest: os.remove(path)
+
+    def day_keys(self) -> list[str]:
+        """Archived days, newest first."""
+        return sorted({os.path.basename(p).split(".")[0] for p in glob.glob(os.path.join(self.directory, "*.rss"))}, reverse=True)
+
+    def rss_fragments(self) -> list[str]:
+        return [self._path(day, "rss") for day in self.day_keys()]
+
+    def json_item_lines(self):
+        """Yields each archived JSON Feed item as its raw JSON text, newest day first."""
+        for day in self.day_keys():
+            with open(self._path(day, "jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip(): yield line.strip()
+
+
+def gzip_copy(path: str):
+    """Writes `path`.gz next to `path`, for hosts that serve precompressed files."""
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def write_json_feed_pages(archive: FeedArchive, home_page_url: str, directory: str = JSON_FEED_DIR,
+                          base_url: str = PAGES_BASE_URL, page_size: int = JSON_FEED_PAGE_SIZE) -> int:
+    """Streams the archive as JSON Feed pages (feed.json, feed-2.json, ...). Returns the page count."""
+    os.makedirs(directory, exist_ok=True)
+    lines = list(archive.json_item_lines())
+    pages = [lines[i:i + page_size] for i in range(0, len(lines), page_size)] or [[]]
+    names = ["feed.json"] + [f"feed-{n}.json" for n in range(2, len(pages) + 1)]
+    for index, (name, page_lines) in enumerate(zip(names, pages)):
+        header = {"version": "https://jsonfeed.org/version/1.1", "title": FEED_TITLE, "description": FEED_DESCRIPTION,
+                  "home_page_url": home_page_url, "feed_url": f"{base_url}/{JSON_FEED_DIR}/feed.json"}
+        if index + 1 < len(names): header["next_url"] = f"{base_url}/{JSON_FEED_DIR}/{names[index + 1]}"
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, separators=(",", ":"), ensure_ascii=False)[:-1] + ',"items":[')
+            f.write(",".join(page_lines))  # Raw archived JSON, not re-parsed.
+            f.write("]}\n")
+        gzip_copy(path)
+    for path in glob.glob(os.path.join(directory, "feed-*.json*")):
+        if os.path.basename(path).split(".")[0] not in {n.split(".")[0] for n in names}: os.remove(path)
+    return len(names)
+
+
+def write_feeds(items, source_url: str, json_feed: dict, now: datetime | None = None,
+                rss_path: str = "rss.xml", json_path: str = "frontpages.json", archive: FeedArchive | None = None,
+                json_feed_dir: str = JSON_FEED_DIR):
+    """Merges tonight's items into the archive and writes every feed output.
+
+    - rss.xml (+ .gz): tonight's items plus the rest of the archive window
+    - frontpages.json: tonight's items in the existing format, plus a compact .min.json (+ .gz)
+    - feed/feed*.json (+ .gz): paginated JSON Feed over the whole archive
+    """
+    now = now or datetime.now(timezone.utc)
+    archive = archive or FeedArchive()
+    today = now.strftime("%Y-%m-%d")
+    archive.update(items, now)
+    with open(rss_path, "w", encoding="utf-8") as f:
+        # Tonight's shard is the first fragment, so the archive supplies every item.
+        write_rss(f, source_url, now, fragment_paths=archive.rss_fragments())
+    gzip_copy(rss_path)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(json_feed, f, indent=2)  # json.dump writes chunk by chunk
+    min_path = json_path.replace(".json", ".min.json")
+    with open(min_path, "w", encoding="utf-8") as f:
+        json.dump(json_feed, f, separators=(",", ":"), ensure_ascii=False)
+    gzip_copy(min_path)
+    pages = write_json_feed_pages(archive, source_url, json_feed_dir)
+    return {"archive_days": len(archive.day_keys()), "json_feed_pages": pages, "today": today}
@@ -1,11 +1,98 @@
 console.log('Starting function initialization');
 
+const crypto = require('crypto');
 const { onRequest } = require('firebase-functions/v2/https');
+const { initializeApp } = require('firebase-admin/app');
+const { getFirestore, FieldValue } = require('firebase-admin/firestore');
 const axios = require('axios');
 const cors = require('cors')({ origin: true });
 
+initializeApp();
+const db = getFirestore();
+
 console.log('Modules loaded successfully');
 
+// The nightly Python job writes the analysis of each doc's full-size image URL to
+// analysis_lookup/{sha256(imageUrl)} (see publisher.analysis_lookup_id); Gemini is
+// only called for URLs it hasn't seen, and the result is written back for next time.
+// Entries carry a `created` time (epoch seconds) and the nightly job prunes old ones.
+const LOOKUP_COLLECTION = 'analysis_lookup';
+const MEMO_MAX_ENTRIES = 500;
+// Only analyses of our own (content-addressed, never-changing) images are written back.
+const CACHEABLE_URL_PREFIX = 'https://firebasestorage.googleapis.com/v0/b/frontpages-fireb.firebasestorage.app/';
+
+// Per-instance LRU memo: a Map iterates in insertion order, so the first key is the least recently used.
+const memo = new Map();
+function memoGet(key) {
+  const value = memo.get(key);
+  if (value !== undefined) { memo.delete(key); memo.set(key, value); }
+  return value;
+}
+function memoSet(key, value) {
+  memo.delete(key);
+  memo.set(key, value);
+  if (memo.size > MEMO_MAX_ENTRIES) memo.delete(memo.keys().next().value);
+}
+// Concurrent requests for the same image share one lookup/Gemini call.
+const inFlight = new Map();
+
+const lookupId = (imageUrl) => crypto.createHash('sha256').update(imageUrl, 'utf8').digest('hex');
+
+async function generateAnalysis(imageUrl) {
+  console.log('Fetching image from:', imageUrl);
+  const imageResponse = await axios.get(imageUrl, { responseType: 'arraybuffer' });
+  console.log('Image fetched, converting to base64');
+  const base64Image = Buffer.from(imageResponse.data, 'binary').toString('base64');
+  if (!process.env.GEMINI_API_KEY) {
+      console.error('GEMINI_API_KEY not found in environment.');
+      throw new Error('Server configuration error: API key is missing.');
+  }
+
+  console.log('Calling Gemini API with gemini-1.5-flash model and analyst prompt...');
+  const geminiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key=${process.env.GEMINI_API_KEY}`;
+
+  const geminiResponse = await axios.post(
+    geminiUrl,
+    {
+      contents: [{
+        parts: [
+          { text: "Please give a solid analysis of the day's news, based on this newspaper front page. Go through the headlines, the stories, what is says about the current state of politics, the public mood etc. Be creative. Start with \"Today's insert newspaper title here front page...\" - this must be how it starts." },
+          { inlineData: { mimeType: 'image/jpeg', data: base64Image } }
+        ]
+      }]
+    },
+    { headers: { 'Content-Type': 'application/json' } }
+  );
+
+  // Renamed 'caption' to 'analysis' for clarity
+  return geminiResponse.data?.candidates?.[0]?.content?.parts?.[0]?.text;
+}
+
+// Memo → Firestore lookup → Gemini (written back). Resolves to { analysis, source }.
+async function describe(imageUrl) {
+  const key = lookupId(imageUrl);
+  const memoised = memoGet(key);
+  if (memoised) return { analysis: memoised, source: 'memo' };
+
+  const docRef = db.collection(LOOKUP_COLLECTION).doc(key);
+  const snapshot = await docRef.get();
+  const stored = snapshot.exists ? snapshot.get('analysis') : null;
+  if (stored) {
+    memoSet(key, stored);
+    return { analysis: stored, source: 'lookup' };
+  }
+
+  const analysis = await generateAnalysis(imageUrl);
+  if (!analysis) return { analysis: 'No analysis generated.', source: 'gemini' };
+  memoSet(key, analysis);
+  if (imageUrl.startsWith(CACHEABLE_URL_PREFIX)) {
+    // A failed write only costs a Gemini call next time, so it doesn't fail the request.
+    await docRef.set({ imageUrl, analysis, source: 'describeimage', created: Date.now() / 1000, updated: FieldValue.serverTimestamp() })
+      .catch((error) => console.error('Could not write analysis back to the lookup:', error.message));
+  }
+  return { analysis, source: 'gemini' };
+}
+
 exports.describeimage = onRequest(
   {
     timeoutSeconds: 120,
@@ -24,36 +111,13 @@ exports.describeimage = onRequest(
         return;
       }
       try {
-        console.log('Fetching image from:', imageUrl);
-        const imageResponse = await axios.get(imageUrl, { responseType: 'arraybuffer' });
-        console.log('Image fetched, converting to base64');
-        const base64Image = Buffer.from(imageResponse.data, 'binary').toString('base64');
-        if (!process.env.GEMINI_API_KEY) {
-            console.error('GEMINI_API_KEY not found in environment.');
-            throw new Error('Server configuration error: API key is missing.');
+        if (!inFlight.has(imageUrl)) {
+          inFlight.set(imageUrl, describe(imageUrl).finally(() => inFlight.delete(imageUrl)));
         }
+        const { analysis, source } = await inFlight.get(imageUrl);
+        console.log(`SUCCESS! Analysis served from ${source}.`);
 
-        console.log('Calling Gemini API with gemini-1.5-flash model and analyst prompt...');
-        const geminiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key=${process.env.GEMINI_API_KEY}`;
-        
-        const geminiResponse = await axios.post(
-          geminiUrl,
-          {
-            contents: [{
-              parts: [
-                { text: "Please give a solid analysis of the day's news, based on this newspaper front page. Go through the headlines, the stories, what is says about the current state of politics, the public mood etc. Be creative. Start with \"Today's insert newspaper title here front page...\" - this must be how it starts." },
-                { inlineData: { mimeType: 'image/jpeg', data: base64Image } }
-              ]
-            }]
-          },
-          { headers: { 'Content-Type': 'application/json' } }
-        );
-
-        // Renamed 'caption' to 'analysis' for clarity
-        const analysis = geminiResponse.data?.candidates?.[0]?.content?.parts?.[0]?.text || 'No analysis generated.';
-        console.log('SUCCESS! Analysis generated:', analysis);
-
-        res.status(200).send({ data: { analysis } });
+        res.status(200).send({ data: { analysis, source } });
 
       } catch (error) {
         const errorMessage = error.response?.data?.error?.message || error.message;
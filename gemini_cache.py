@@ -0,0 +1,121 @@
+# ===================================================================================
+# === gemini_cache.py                                                             ===
+# === Persistent cache for Gemini results, keyed by image + prompt + model        ===
+# ===================================================================================
+
+import abc
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import instrumentation
+from publisher import commit_in_batches
+
+
+class CacheBackend(abc.ABC):
+    """Storage for cache entries: {"value": <JSON string>, "created": <epoch seconds>}."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> dict | None: ...
+
+    @abc.abstractmethod
+    def set(self, key: str, entry: dict): ...
+
+    @abc.abstractmethod
+    def evict(self, max_age_seconds: float, max_entries: int) -> int:
+        """Deletes expired entries, then the oldest ones beyond `max_entries`. Returns the count."""
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Single-file cache, suited to a CI artifact or a local run."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS gemini_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS gemini_cache_created ON gemini_cache (created)")
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM gemini_cache WHERE key = ?", (key,)).fetchone()
+        return {"value": row[0], "created": row[1]} if row else None
+
+    def set(self, key: str, entry: dict):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO gemini_cache (key, value, created) VALUES (?, ?, ?)",
+                               (key, entry["value"], entry["created"]))
+
+    def evict(self, max_age_seconds: float, max_entries: int) -> int:
+        with self._lock, self._conn:
+            expired = self._conn.execute("DELETE FROM gemini_cache WHERE created < ?", (time.time() - max_age_seconds,)).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM gemini_cache WHERE key IN (SELECT key FROM gemini_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (max_entries,)).rowcount
+        return expired + overflow
+
+
+class FirestoreCacheBackend(CacheBackend):
+    """One document per entry in a Firestore collection, shared by every run."""
+
+    def __init__(self, db, collection_name: str):
+        self.db = db
+        self.collection_ref = db.collection(collection_name)
+
+    def get(self, key: str) -> dict | None:
+        doc = self.collection_ref.document(key).get()
+        return doc.to_dict() if doc.exists else None
+
+    def set(self, key: str, entry: dict):
+        self.collection_ref.document(key).set(entry)
+
+    def evict(self, max_age_seconds: float, max_entries: int) -> int:
+        entries = sorted(((doc.get("created") or 0, doc.reference) for doc in self.collection_ref.select(["created"]).stream()),
+                         key=lambda entry: entry[0], reverse=True)
+        cutoff = time.time() - max_age_seconds
+        stale = [ref for index, (created, ref) in enumerate(entries) if created < cutoff or index >= max_entries]
+        commit_in_batches(self.db, (("delete", ref, None) for ref in stale))
+        return len(stale)
+
+
+class GeminiCache:
+    """Caches JSON-serialisable model results with a TTL and a size cap.
+
+    Keys combine the SHA-256 of the image, of the prompt text and the model name,
+    so editing a prompt or switching model naturally misses the old entries.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float, max_entries: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(image_data: bytes, prompt: str, model_name: str) -> str:
+        parts = [hashlib.sha256(image_data).hexdigest(), hashlib.sha256(prompt.encode("utf-8")).hexdigest(), model_name]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            print(f"     - ⚠️ Gemini cache read failed: {e}"); return None
+        if not entry or time.time() - entry.get("created", 0) > self.ttl_seconds:
+            instrumentation.count("gemini_cache.lookups", result="expired" if entry else "miss")
+            return None
+        instrumentation.count("gemini_cache.lookups", result="hit")
+        return json.loads(entry["value"])
+
+    def set(self, key: str, value):
+        try:
+            self.backend.set(key, {"value": json.dumps(value), "created": time.time()})
+        except Exception as e:
+            print(f"     - ⚠️ Gemini cache write failed: {e}")
+
+    def evict(self) -> int:
+        try:
+            return self.backend.evict(self.ttl_seconds, self.max_entries)
+        except Exception as e:
+            print(f"⚠️ Gemini cache eviction failed: {e}"); return 0
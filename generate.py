@@ -1,139 +1,60 @@
-import requests
-from bs4 import BeautifulSoup
+import feeds
+import instrumentation
+import io
+import os
+import sources
 from datetime import datetime, timezone
-import re
 import json # <-- ADDED for JSON functionality
 
-# --- THIS IS YOUR ORIGINAL, UNCHANGED SCRAPING FUNCTION ---
-def get_tomorrows_papers_front_pages():
-    """Scrape front page images from Tomorrow's Papers Today"""
-    url = "https://www.tomorrowspapers.co.uk/"
-    
-    # Headers to avoid 403 blocking
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
-    
+# --- SCRAPER: the sites are plugins in sources.py, fetched concurrently and merged per newspaper ---
+SOURCE_URL = sources.TomorrowsPapersSource.url  # The feed's "link"
+SCRAPE_STATE_PATH = "scrape_state.json"  # ETag/Last-Modified and pages of each source's last fetch, for conditional requests
+
+def load_scrape_state(path=SCRAPE_STATE_PATH):
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        html = response.text
-        soup = BeautifulSoup(html, "html.parser")
-        
-        items = []
-        
-        # Look for images in the front pages section
-        # Try different selectors that might contain the front page images
-        img_selectors = [
-            "img[src*='front']",  # Images with 'front' in src
-            "img[alt*='front']",  # Images with 'front' in alt text
-            "img[alt*='newspaper']",  # Images with 'newspaper' in alt
-            ".front-page img",  # Images in elements with front-page class
-            "article img",  # Images in article elements
-            "main img",  # Images in main content
-            "img"  # Fallback to all images
-        ]
-        
-        for selector in img_selectors:
-            images = soup.select(selector)
-            for img in images:
-                src = img.get("src") or img.get("data-src")
-                if not src:
-                    continue
-                    
-                # Convert relative URLs to absolute
-                if src.startswith("//"):
-                    src = "https:" + src
-                elif src.startswith("/"):
-                    src = "https://www.tomorrowspapers.co.uk" + src
-                elif not src.startswith("http"):
-                    continue
-                
-                # Skip very small images (likely logos/icons)
-                width = img.get("width")
-                height = img.get("height")
-                if width and height:
-                    try:
-                        if int(width) < 100 or int(height) < 100:
-                            continue
-                    except ValueError:
-                        pass
-                
-                alt = img.get("alt", "")
-                
-                # If no alt text, extract newspaper name from filename
-                if not alt or alt.strip() == "":
-                    # Extract filename from URL and clean it up
-                    filename = src.split('/')[-1].split('.')[0]  # Get filename without extension
-                    # Remove trailing numbers like "-1", "-8" etc first
-                    filename = re.sub(r'-\d+$', '', filename)
-                    # Then replace hyphens with spaces
-                    alt = filename.replace('-', ' ').strip()
-                    if not alt:
-                        alt = "Newspaper Front Page"
-                
-                # Skip images that are clearly not front pages
-                if any(skip_word in src.lower() for skip_word in ['logo', 'icon', 'avatar', 'profile']):
-                    continue
-                if any(skip_word in alt.lower() for skip_word in ['logo', 'icon', 'avatar', 'profile']):
-                    continue
-                
-                # Avoid duplicates
-                if not any(item[1] == src for item in items):
-                    items.append((alt, src))
-
-                if len(items) >= 10:  # Get up to 10 images
-                    break
-            
-            if items:  # If we found images with this selector, stop trying others
-                break
-        
-        return items
-        
-    except requests.RequestException as e:
-        print(f"Error fetching Newsworks page: {e}")
-        return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_scrape_state(state, path=SCRAPE_STATE_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+def parse_front_pages(html):
+    """(alt, src) of the front pages on a Tomorrow's Papers Today page."""
+    return [(page.title, page.url) for page in sources.SOURCES["tomorrowspapers"].parse(html)]
+
+def get_tomorrows_papers_front_pages(state=None):
+    """Scrape front page images from Tomorrow's Papers Today alone (None if unchanged since `state`, [] on error)."""
+    pages, status = sources.SOURCES["tomorrowspapers"].fetch(state)
+    return None if status == sources.NOT_MODIFIED else [(page.title, page.url) for page in pages]
+
+def get_front_pages(state=None):
+    """Scrape every enabled source concurrently and merge them into (title, url) items.
 
-# --- THIS IS YOUR ORIGINAL, UNCHANGED RSS FUNCTION ---
+    With a `state` dict (see load_scrape_state) the requests are conditional: it
+    returns None when no source has changed since the last fetch, and otherwise
+    stores each source's new validators and pages in `state` for the caller to save.
+    Raises sources.SourcesUnavailable when every source failed.
+    """
+    pages = sources.fetch_all(state)
+    return [(page.title, page.url) for page in pages] if pages is not None else None
+
+# --- RSS: streamed through feeds.write_rss, which escapes titles and URLs properly ---
 def generate_rss(items, source_url):
     """Generate RSS feed from front page items"""
-    rss_items = ""
-    for title, img_url in items:
-        # Escape XML special characters in title
-        title = title.replace("&", "&").replace("<", "<").replace(">", ">")
-        
-        rss_items += f"""
-        <item>
-          <title>{title}</title>
-          <link>{img_url}</link>
-          <description><![CDATA[<img src="{img_url}" alt="{title}" />]]></description>
-          <guid>{img_url}</guid>
-          <pubDate>{datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")}</pubDate>
-        </item>
-        """
-
-    rss_feed = f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0">
-  <channel>
-    <title>UK Newspaper Front Pages - Tomorrow's Papers Today</title>
-    <link>{source_url}</link>
-    <description>Daily UK newspaper front pages from Tomorrow's Papers Today</description>
-    <lastBuildDate>{datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")}</lastBuildDate>
-    <language>en-GB</language>
-    {rss_items}
-  </channel>
-</rss>
-"""
-    return rss_feed
+    out = io.StringIO()
+    feeds.write_rss(out, source_url, datetime.now(timezone.utc), items=items)
+    return out.getvalue()
 
 # --- THIS IS THE NEW FUNCTION TO GENERATE JSON ---
 def generate_json(items, source_url, rss_feed_url):
     """Generate JSON feed from front page items in the specified format."""
+    return json.dumps(build_json_feed(items, source_url, rss_feed_url), indent=2)
+
+def build_json_feed(items, source_url, rss_feed_url):
+    """The JSON feed as a dict; its "items" are what the upload pipeline consumes."""
     pub_date_str = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
     output_dict = {
@@ -150,7 +71,7 @@ def generate_json(items, source_url, rss_feed_url):
     }
 
     for title, img_url in items:
-        image_html = f'<img src="{img_url}" alt="{title}">'
+        image_html = feeds.image_html(img_url, title)
         
         item_dict = {
             "title": title,
@@ -166,36 +87,58 @@ def generate_json(items, source_url, rss_feed_url):
         }
         output_dict["items"].append(item_dict)
 
-    return json.dumps(output_dict, indent=2)
+    return output_dict
 
 # --- THIS IS YOUR MAIN FUNCTION, MODIFIED TO ADD THE JSON STEPS ---
-def main():
-    """Main function to scrape and generate RSS and JSON"""
-    source_url = "https://www.tomorrowspapers.co.uk/"
+def scrape_and_write_feeds(output_dir=None):
+    """Scrapes the page and writes rss.xml and frontpages.json.
+
+    Returns the JSON feed's items so they can be handed straight to the upload
+    pipeline, or None when there is nothing new (page unchanged or no images).
+    With `output_dir`, the feeds, archive and scrape state are written there
+    instead of the repository root (e.g. for a local dry run).
+    """
+    def path(name): return os.path.join(output_dir, name) if output_dir else name
+    if output_dir: os.makedirs(output_dir, exist_ok=True)
+    source_url = SOURCE_URL
     rss_feed_url = "https://lak7474.github.io/frontpages-app-repo/rss.xml"
     
-    print("Scraping front pages from Tomorrow's Papers Today...")
-    items = get_tomorrows_papers_front_pages()
+    print(f"Scraping front pages from {', '.join(sources.ENABLED_SOURCES)}...")
+    scrape_state = load_scrape_state(path(SCRAPE_STATE_PATH))
+    try:
+        items = get_front_pages(state=scrape_state)
+    except sources.SourcesUnavailable as e:
+        print(f"Error fetching front pages: {e}; feeds left as they are.")
+        return None
     
+    if items is None:
+        print("No source has changed since the last run (304), feeds left as they are.")
+        return None
     if not items:
         print("No front page images found.")
-        return
+        return None
     
     print(f"Found {len(items)} front page images:")
     for title, url in items:
         print(f"  - {title}")
     
-    # Original RSS generation
-    rss_xml = generate_rss(items, source_url)
-    with open("rss.xml", "w", encoding="utf-8") as f:
-        f.write(rss_xml)
-    print("RSS feed generated as 'rss.xml'")
-
-    # Added JSON generation
-    json_output = generate_json(items, source_url, rss_feed_url)
-    with open("frontpages.json", "w", encoding="utf-8") as f:
-        f.write(json_output)
-    print("JSON feed generated as 'frontpages.json'")
+    # Tonight's items are merged into the rolling archive, then every feed file is streamed out.
+    instrumentation.count("scrape.items", len(items))
+    with instrumentation.span("feeds.write"):
+        json_feed = build_json_feed(items, source_url, rss_feed_url)
+        stats = feeds.write_feeds(items, source_url, json_feed, rss_path=path("rss.xml"), json_path=path("frontpages.json"),
+                                  archive=feeds.FeedArchive(path(feeds.ARCHIVE_DIR)), json_feed_dir=path(feeds.JSON_FEED_DIR))
+    print(f"RSS feed generated as '{path('rss.xml')}' ({stats['archive_days']} days archived)")
+    print(f"JSON feed generated as '{path('frontpages.json')}'")
+    print(f"JSON Feed generated in '{path(feeds.JSON_FEED_DIR)}/' ({stats['json_feed_pages']} pages)")
+
+    save_scrape_state(scrape_state, path(SCRAPE_STATE_PATH))
+    return json_feed["items"]
+
+def main():
+    """Main function to scrape and generate RSS and JSON"""
+    scrape_and_write_feeds()
+    instrumentation.write_report(entry="generate")
 
 if __name__ == "__main__":
     main()
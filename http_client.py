@@ -0,0 +1,92 @@
+# ===================================================================================
+# === http_client.py                                                              ===
+# === Shared pooled HTTP session with timeouts, retries and a response size cap   ===
+# ===================================================================================
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrumentation
+
+# (connect, read) timeouts in seconds per kind of call.
+TIMEOUTS = {
+    "page": (10, 30),
+    "feed": (10, 30),
+    "image": (10, 60),
+    "search": (5, 15),
+    "default": (10, 30),
+}
+# Largest body accepted per kind of call, in bytes.
+MAX_BYTES = {
+    "page": 5 * 1024 * 1024,
+    "feed": 5 * 1024 * 1024,
+    "image": 30 * 1024 * 1024,
+    "search": 1024 * 1024,
+    "default": 10 * 1024 * 1024,
+}
+POOL_CONNECTIONS = 8  # Number of hosts kept in the pool
+POOL_MAXSIZE = 16  # Keep-alive connections per host
+RETRY_POLICY = Retry(
+    total=4,
+    backoff_factor=0.5,  # 0.5s, 1s, 2s, 4s ...
+    backoff_jitter=0.5,  # ... plus up to 0.5s of random jitter
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # Hand the last response back so raise_for_status() reports it
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ResponseTooLarge(requests.RequestException):
+    """The response body was bigger than the cap for its kind of call."""
+
+
+def get_session() -> requests.Session:
+    """The process-wide session, so connections are reused across calls and threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=RETRY_POLICY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get(url: str, kind: str = "default", max_bytes: int | None = None, **kwargs) -> requests.Response:
+    """GET through the shared session with the timeout and size cap for `kind`.
+
+    The body is read up front (capped), so .content, .text and .json() work as usual.
+    """
+    kwargs.setdefault("timeout", TIMEOUTS.get(kind, TIMEOUTS["default"]))
+    limit = max_bytes or MAX_BYTES.get(kind, MAX_BYTES["default"])
+    with instrumentation.span(f"http.{kind}"):
+        response = get_session().get(url, stream=True, **kwargs)
+        _read_capped(url, response, limit)
+    retries = getattr(response.raw, "retries", None)
+    instrumentation.count("http.requests", kind=kind, status=response.status_code)
+    instrumentation.count("http.bytes", len(response.content), kind=kind)
+    if retries and retries.history: instrumentation.count("http.retries", len(retries.history), kind=kind)
+    return response
+
+
+def _read_capped(url: str, response: requests.Response, limit: int):
+    try:
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > limit:
+            raise ResponseTooLarge(f"{url} declares {declared} bytes (limit {limit})", response=response)
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > limit:
+                raise ResponseTooLarge(f"{url} is larger than {limit} bytes", response=response)
+        response._content = bytes(body)
+    finally:
+        response.close()
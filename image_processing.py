@@ -0,0 +1,120 @@
+# ===================================================================================
+# === image_processing.py                                                         ===
+# === CPU-bound image work (Pillow + Blurhash), kept free of Firebase/Gemini      ===
+# === imports so it can run inside a process pool                                 ===
+# ===================================================================================
+
+import hashlib
+import os
+from io import BytesIO
+
+from PIL import Image
+
+import blurhash_encoder
+import instrumentation
+
+# Brightness factor applied to each published variant (same result as ImageEnhance.Brightness).
+BRIGHTNESS_VARIANTS = {'light': 0.9, 'dark': 0.8}
+BLURHASH_COMPONENTS = (4, 3)
+# Blurhash only keeps 4x3 colour averages, so a few dozen pixels per side are plenty.
+BLURHASH_THUMBNAIL_EDGE = blurhash_encoder.WORKING_EDGE
+
+
+def _parse_size_ladder(spec: str) -> dict[str, int | None]:
+    """"thumb:320,medium:960,full:0" → {'thumb': 320, 'medium': 960, 'full': None} (0 keeps full size)."""
+    ladder = {}
+    for entry in spec.split(','):
+        name, _, edge = entry.strip().partition(':')
+        ladder[name] = int(edge) or None
+    return ladder
+
+# Renditions published for every variant: name → longest edge in pixels (None = full scan).
+SIZE_LADDER = _parse_size_ladder(os.environ.get("IMAGE_SIZE_LADDER", "thumb:320,medium:960,full:0"))
+# Encoder settings per output format.
+IMAGE_FORMATS = {
+    'webp': {'content_type': 'image/webp', 'save': {'format': 'WEBP', 'quality': int(os.environ.get("IMAGE_WEBP_QUALITY", "78")), 'method': 4}},
+    'jpeg': {'content_type': 'image/jpeg', 'save': {'format': 'JPEG', 'quality': int(os.environ.get("IMAGE_JPEG_QUALITY", "82")), 'progressive': True, 'optimize': True}},
+}
+
+
+def _brightness_lut(factor: float) -> list[int]:
+    """Point table for an RGB image; truncates like ImageEnhance.Brightness's blend."""
+    return [min(255, int(i * factor)) for i in range(256)] * 3
+
+
+def _encode(img: Image.Image, save_options: dict) -> bytes:
+    buffer = BytesIO(); img.save(buffer, **save_options)
+    return buffer.getvalue()
+
+
+def render_renditions(img: Image.Image) -> list[dict]:
+    """Encodes `img` at every size of the ladder in every format.
+
+    Sizes are derived largest first, each from the previous one, so the full scan
+    is only resampled once. Each rendition carries a content hash for its blob name.
+    """
+    renditions = []
+    current = img
+    for size, edge in sorted(SIZE_LADDER.items(), key=lambda entry: entry[1] or float('inf'), reverse=True):
+        if edge and max(current.size) > edge:
+            current = current.copy(); current.thumbnail((edge, edge), Image.LANCZOS)
+        for fmt, options in IMAGE_FORMATS.items():
+            data = _encode(current, options['save'])
+            renditions.append({
+                'size': size, 'format': fmt, 'content_type': options['content_type'], 'data': data,
+                'width': current.width, 'height': current.height, 'sha256': hashlib.sha256(data).hexdigest(),
+            })
+    return renditions
+
+
+def render_variants(original_img_data: bytes) -> dict[str, dict]:
+    """Decodes the scan once and derives every brightness variant, its renditions and blurhash from it.
+
+    The light blurhash is taken from the unadjusted scan and the dark one from the
+    dark variant, as before, but both come from one shared downscaled thumbnail.
+    """
+    with instrumentation.span("image.decode"), Image.open(BytesIO(original_img_data)) as img:
+        img_rgb = img.convert('RGB')
+    width, height = img_rgb.size
+    aspect_ratio = height / width if width else None
+    thumbnail = img_rgb.copy(); thumbnail.thumbnail((BLURHASH_THUMBNAIL_EDGE, BLURHASH_THUMBNAIL_EDGE), Image.BILINEAR, reducing_gap=2.0)
+    x_components, y_components = BLURHASH_COMPONENTS
+    variants = {}
+    for brightness, factor in BRIGHTNESS_VARIANTS.items():
+        lut = _brightness_lut(factor)
+        with instrumentation.span("image.renditions", brightness=brightness):
+            renditions = render_renditions(img_rgb.point(lut))
+        with instrumentation.span("image.blurhash", brightness=brightness):
+            blurhash_source = thumbnail if brightness == 'light' else thumbnail.point(lut)
+            blurhash = blurhash_encoder.encode(blurhash_source, x_components=x_components, y_components=y_components)
+        instrumentation.count("image.encoded_bytes", sum(len(rendition['data']) for rendition in renditions))
+        variants[brightness] = {'renditions': renditions, 'width': width, 'height': height, 'aspect': aspect_ratio, 'blurhash': blurhash}
+    return variants
+
+
+def process_image_job(job: dict) -> dict | None:
+    """Stage 2 & 3: builds the light/dark JPEGs and their blurhashes for one paper."""
+    original_filename = job['original_filename']
+    try:
+        print(f"   - Performing Pillow & Blurhash operations for {original_filename}...")
+        variants = render_variants(job['original_img_data'])
+        print(f"     - Pillow & Blurhash operations complete for {original_filename}.")
+    except Exception as e: print(f" ❌ Failed during IMAGE processing for {original_filename}: {e}"); return None
+    job = dict(job)
+    job['variants'] = variants
+    return job
+
+
+def downscale_for_model(original_img_data: bytes, max_edge: int, quality: int) -> bytes:
+    """Shrinks the scan to `max_edge` pixels on its longest side and recompresses it as JPEG.
+
+    Gemini reads a front page just as well at this size, and the request is a
+    fraction of the original upload.
+    """
+    with Image.open(BytesIO(original_img_data)) as img:
+        img.draft('RGB', (max_edge, max_edge))  # Lets the JPEG decoder skip detail we'd throw away.
+        img_rgb = img.convert('RGB')
+    if max(img_rgb.size) > max_edge:
+        img_rgb.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    buffer = BytesIO(); img_rgb.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
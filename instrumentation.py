@@ -0,0 +1,165 @@
+# ===================================================================================
+# === instrumentation.py                                                          ===
+# === Spans and counters for every run, written out as a JSON-lines run report    ===
+# === (and optionally a Prometheus textfile)                                      ===
+# ===================================================================================
+
+import contextlib
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+RUN_REPORT_PATH = os.environ.get("RUN_REPORT_PATH", "run_report.jsonl")  # Appended to, one block of lines per run
+RUN_REPORT_PROMETHEUS_PATH = os.environ.get("RUN_REPORT_PROMETHEUS_PATH")  # Set to also write a node_exporter textfile
+PROMETHEUS_PREFIX = "frontpages"
+
+
+class RunRecorder:
+    """Collects the spans and counters of one run; safe to share between threads."""
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.spans: list[dict] = []
+        self.counters: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float, start: float, ok: bool = True, attrs: dict | None = None):
+        with self._lock:
+            self.spans.append({"name": name, "seconds": seconds, "start": start - self.started, "ok": ok, "attrs": attrs or {}})
+
+    def add(self, name: str, value: float = 1, labels: dict | None = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def drain(self) -> dict:
+        """Hands over everything recorded so far (with absolute start times) and starts afresh."""
+        with self._lock:
+            spans = [{**span, "start": span["start"] + self.started} for span in self.spans]
+            counters = [(name, dict(labels), value) for (name, labels), value in self.counters.items()]
+            self.spans, self.counters = [], {}
+        return {"spans": spans, "counters": counters}
+
+    def merge(self, snapshot: dict):
+        """Adds a drain() snapshot taken in another process."""
+        for span in snapshot["spans"]: self.add_span(span["name"], span["seconds"], span["start"], span["ok"], span["attrs"])
+        for name, labels, value in snapshot["counters"]: self.add(name, value, labels)
+
+    def stage_summary(self) -> dict[str, dict]:
+        by_name = {}
+        with self._lock:
+            for span in self.spans: by_name.setdefault(span["name"], []).append(span["seconds"])
+        summary = {}
+        for name, durations in sorted(by_name.items()):
+            durations.sort()
+            summary[name] = {"count": len(durations), "total_seconds": sum(durations), "p50": statistics.median(durations),
+                             "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))], "max": durations[-1]}
+        return summary
+
+
+_recorder = RunRecorder()
+
+
+def recorder() -> RunRecorder:
+    return _recorder
+
+
+def reset() -> RunRecorder:
+    """Starts a new run (the previous one's data is dropped)."""
+    global _recorder
+    _recorder = RunRecorder()
+    return _recorder
+
+
+class span(contextlib.ContextDecorator):
+    """Times a block, or every call of a decorated function, under `name`.
+
+        with instrumentation.span("scrape.parse"): ...
+        @instrumentation.span("search")
+        def google_search(...): ...
+
+    Spans that end in an exception are recorded with ok=False.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.name, self.attrs = name, attrs
+
+    def _recreate_cm(self):
+        return span(self.name, **self.attrs)  # A fresh span per decorated call, so threads don't share timers.
+
+    def __enter__(self):
+        self._start_wall, self._start = time.time(), time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _recorder.add_span(self.name, time.perf_counter() - self._start, self._start_wall, ok=exc_type is None, attrs=self.attrs)
+        return False
+
+
+def count(name: str, value: float = 1, **labels):
+    """Adds `value` to a counter, e.g. count("http.bytes", len(body), kind="image")."""
+    _recorder.add(name, value, labels)
+
+
+def record_span(name: str, seconds: float, start: float | None = None, ok: bool = True, **attrs):
+    """Records a span timed elsewhere (e.g. in a worker process)."""
+    _recorder.add_span(name, seconds, start if start is not None else time.time() - seconds, ok, attrs)
+
+
+def _prometheus_name(name: str) -> str:
+    return f"{PROMETHEUS_PREFIX}_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels: return ""
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"') for key, value in labels.items()}
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(escaped.items())) + "}"
+
+
+def write_prometheus(run: RunRecorder, path: str, summary: dict):
+    lines = [f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total gauge", f"# TYPE {PROMETHEUS_PREFIX}_stage_calls gauge"]
+    for name, stats in summary.items():
+        lines.append(f"{PROMETHEUS_PREFIX}_stage_seconds_total{_prometheus_labels({'stage': name})} {stats['total_seconds']:.6f}")
+        lines.append(f"{PROMETHEUS_PREFIX}_stage_calls{_prometheus_labels({'stage': name})} {stats['count']}")
+    for (name, labels), value in sorted(run.counters.items()):
+        lines.append(f"{_prometheus_name(name)}_total{_prometheus_labels(dict(labels))} {value:g}")
+    lines.append(f"{PROMETHEUS_PREFIX}_run_seconds {time.time() - run.started:.3f}")
+    lines.append(f"{PROMETHEUS_PREFIX}_run_timestamp_seconds {time.time():.0f}")
+    tmp_path = path + ".tmp"  # node_exporter may read at any moment, so swap the file in whole
+    with open(tmp_path, "w", encoding="utf-8") as f: f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def write_report(path: str | None = RUN_REPORT_PATH, prometheus_path: str | None = RUN_REPORT_PROMETHEUS_PATH, **meta) -> dict:
+    """Appends this run's report to `path` as JSON lines and prints the slowest stages.
+
+    Lines: one "run" header, every "span", every "counter", and a "stage" summary per
+    span name. Returns the stage summary.
+    """
+    run = _recorder
+    summary = run.stage_summary()
+    finished = time.time()
+    run_fields = {"run_id": run.run_id}
+    try:
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                header = {"type": "run", **run_fields, "started": datetime.fromtimestamp(run.started, timezone.utc).isoformat(timespec="seconds"),
+                          "seconds": round(finished - run.started, 3), **meta}
+                f.write(json.dumps(header) + "\n")
+                with run._lock:
+                    spans, counters = list(run.spans), sorted(run.counters.items())
+                for entry in spans: f.write(json.dumps({"type": "span", **run_fields, **entry, "seconds": round(entry["seconds"], 6), "start": round(entry["start"], 3)}) + "\n")
+                for (name, labels), value in counters: f.write(json.dumps({"type": "counter", **run_fields, "name": name, "labels": dict(labels), "value": value}) + "\n")
+                for name, stats in summary.items(): f.write(json.dumps({"type": "stage", **run_fields, "name": name, **{key: round(value, 6) for key, value in stats.items()}}) + "\n")
+        if prometheus_path: write_prometheus(run, prometheus_path, summary)
+    except OSError as e:
+        print(f"⚠️ Could not write the run report: {e}")
+    slowest = sorted(summary.items(), key=lambda entry: entry[1]["total_seconds"], reverse=True)[:8]
+    if slowest:
+        print(f"\n⏱️  Run {run.run_id}: {finished - run.started:.1f}s. Slowest stages (total / calls):")
+        for name, stats in slowest: print(f"   {name:<28} {stats['total_seconds']:>8.2f}s  ×{stats['count']}")
+    return summary
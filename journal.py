@@ -0,0 +1,119 @@
+# ===================================================================================
+# === journal.py                                                                  ===
+# === Per-paper progress of a run, written as each stage finishes, so a run that  ===
+# === dies part-way can be resumed instead of redone                              ===
+# ===================================================================================
+
+import abc
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from manifest import url_key
+from publisher import commit_in_batches
+
+# The order a paper goes through; "published" entries are removed from the journal.
+STAGES = ("downloaded", "analysed", "encoded", "uploaded", "published")
+
+
+class JournalBackend(abc.ABC):
+    """Storage for journal entries: {"url", "sha256", "stages": {stage: iso time}, ...stage outputs, "updated"}."""
+
+    @abc.abstractmethod
+    def load(self) -> dict[str, dict]: ...
+
+    @abc.abstractmethod
+    def save(self, key: str, entry: dict): ...
+
+    @abc.abstractmethod
+    def delete(self, keys: list[str]): ...
+
+
+class SQLiteJournalBackend(JournalBackend):
+    """Single-file journal for local runs (or a CI cache); each save is its own transaction."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS run_journal (key TEXT PRIMARY KEY, entry TEXT NOT NULL)")
+
+    def load(self) -> dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, entry FROM run_journal").fetchall()
+        return {key: json.loads(entry) for key, entry in rows}
+
+    def save(self, key: str, entry: dict):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO run_journal (key, entry) VALUES (?, ?)", (key, json.dumps(entry)))
+
+    def delete(self, keys: list[str]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM run_journal WHERE key = ?", [(key,) for key in keys])
+
+
+class FirestoreJournalBackend(JournalBackend):
+    """One document per paper, so it outlives the runner that wrote it."""
+
+    def __init__(self, db, collection_name: str):
+        self.db = db
+        self.collection_ref = db.collection(collection_name)
+
+    def load(self) -> dict[str, dict]:
+        return {doc.id: doc.to_dict() for doc in self.collection_ref.stream()}
+
+    def save(self, key: str, entry: dict):
+        self.collection_ref.document(key).set(entry)
+
+    def delete(self, keys: list[str]):
+        commit_in_batches(self.db, (("delete", self.collection_ref.document(key), None) for key in keys))
+
+
+class RunJournal:
+    """Where each paper of the current run has got to, and what its finished stages produced.
+
+    Entries are keyed by image URL and only count for the same bytes, so a resumed run
+    never reuses results for a page that has since changed. Entries older than
+    `max_age_seconds` are deleted on open; a fresh (non-resume) run starts with none.
+    """
+
+    def __init__(self, backend: JournalBackend, resume: bool = False, max_age_seconds: float = 36 * 3600):
+        self.backend = backend
+        cutoff = time.time() - max_age_seconds
+        stored = backend.load()
+        stale = [key for key, entry in stored.items() if entry.get("updated", 0) < cutoff]
+        if stale: backend.delete(stale)
+        self.entries = {key: entry for key, entry in stored.items() if key not in stale} if resume else {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, sha256: str) -> dict | None:
+        """The entry for `url` if it was made for the same bytes, else None."""
+        entry = self.entries.get(url_key(url))
+        return entry if entry and entry.get("sha256") == sha256 else None
+
+    def mark(self, url: str, sha256: str, stage: str, **outputs):
+        """Records that `url` finished `stage` (with whatever it produced) and saves the entry at once."""
+        key = url_key(url)
+        with self._lock:
+            entry = self.entries.get(key)
+            if not entry or entry.get("sha256") != sha256: entry = {"url": url, "sha256": sha256, "stages": {}}
+            entry = {**entry, **outputs, "stages": {**entry["stages"], stage: datetime.now(timezone.utc).isoformat()}, "updated": time.time()}
+            self.entries[key] = entry
+        self.backend.save(key, entry)
+
+    def published(self, urls):
+        """The final stage: these papers are live, so their entries are dropped."""
+        keys = [key for key in {url_key(url) for url in urls} if key in self.entries]
+        with self._lock:
+            for key in keys: self.entries.pop(key)
+        if keys: self.backend.delete(keys)
+
+    def summary(self) -> dict[str, int]:
+        """How many papers got each stage as far as the last one they finished."""
+        counts = {}
+        for entry in self.entries.values():
+            last = max(entry["stages"], key=STAGES.index, default=None)
+            if last: counts[last] = counts.get(last, 0) + 1
+        return counts
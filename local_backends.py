@@ -0,0 +1,204 @@
+# ===================================================================================
+# === local_backends.py                                                           ===
+# === Offline backends: images as files, documents in SQLite, a canned model      ===
+# === (no credentials or network needed, for dry runs and load tests)             ===
+# ===================================================================================
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from backends import Backends, DocumentStore, ModelClient, StorageBackend
+
+
+class _ServerTimestamp:
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()  # Stored as the write time, like Firestore's sentinel
+
+
+def _json_default(value):
+    if value is SERVER_TIMESTAMP: return datetime.now(timezone.utc).isoformat()
+    if isinstance(value, datetime): return value.isoformat()
+    if isinstance(value, (bytes, bytearray)): return value.hex()
+    raise TypeError(f"{type(value).__name__} can't be stored in the local document store")
+
+
+class LocalStorageBackend(StorageBackend):
+    """Writes each blob under `root`; URLs are file:// URIs unless a `base_url` is given."""
+
+    def __init__(self, root: str, base_url: str | None = None):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def upload(self, blob_path: str, data: bytes, content_type: str, cache_control: str | None = None) -> str:
+        path = self.root / blob_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return f"{self.base_url}/{blob_path}" if self.base_url else path.resolve().as_uri()
+
+
+# --- Documents ---
+class LocalSnapshot:
+    def __init__(self, reference, data: dict | None):
+        self.reference, self.id, self._data = reference, reference.id, data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str):
+        return (self._data or {}).get(field)
+
+
+class LocalDocumentReference:
+    def __init__(self, store: "LocalDocumentStore", path: str):
+        self._store, self.path, self.id = store, path, path.rsplit("/", 1)[-1]
+
+    def get(self) -> LocalSnapshot:
+        return LocalSnapshot(self, self._store.read(self.path))
+
+    def set(self, data: dict, merge: bool = False):
+        self._store.apply([(self.path, data, merge)])
+
+    def delete(self):
+        self._store.apply([(self.path, None, False)])
+
+    def collection(self, name: str) -> "LocalCollectionReference":
+        return LocalCollectionReference(self._store, f"{self.path}/{name}")
+
+
+class LocalCollectionReference:
+    def __init__(self, store: "LocalDocumentStore", path: str, fields: list[str] | None = None):
+        self._store, self.path, self._fields = store, path, fields
+
+    def document(self, doc_id: str) -> LocalDocumentReference:
+        return LocalDocumentReference(self._store, f"{self.path}/{doc_id}")
+
+    def list_documents(self) -> list[LocalDocumentReference]:
+        return [self.document(doc_id) for doc_id in self._store.ids(self.path)]
+
+    def select(self, fields: list[str]) -> "LocalCollectionReference":
+        return LocalCollectionReference(self._store, self.path, fields)
+
+    def stream(self):
+        for doc_id, data in self._store.documents(self.path):
+            if self._fields is not None: data = {field: data[field] for field in self._fields if field in data}
+            yield LocalSnapshot(self.document(doc_id), data)
+
+
+class LocalWriteBatch:
+    def __init__(self, store: "LocalDocumentStore"):
+        self._store, self._operations = store, []
+
+    def set(self, reference: LocalDocumentReference, data: dict, merge: bool = False):
+        self._operations.append((reference.path, data, merge))
+
+    def delete(self, reference: LocalDocumentReference):
+        self._operations.append((reference.path, None, False))
+
+    def commit(self):
+        self._store.apply(self._operations); self._operations = []
+
+
+class LocalDocumentStore(DocumentStore):
+    """Firestore-shaped documents in one SQLite table (":memory:" for a throwaway store).
+
+    Sub-collections are just longer paths; a batch commit is one transaction.
+    """
+
+    SERVER_TIMESTAMP = SERVER_TIMESTAMP
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, parent TEXT NOT NULL, data TEXT NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS documents_parent ON documents (parent)")
+
+    def read(self, path: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM documents WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ids(self, parent: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM documents WHERE parent = ? ORDER BY path", (parent,)).fetchall()
+        return [path.rsplit("/", 1)[-1] for path, in rows]
+
+    def documents(self, parent: str) -> list[tuple[str, dict]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT path, data FROM documents WHERE parent = ? ORDER BY path", (parent,)).fetchall()
+        return [(path.rsplit("/", 1)[-1], json.loads(data)) for path, data in rows]
+
+    def apply(self, operations: list[tuple[str, dict | None, bool]]):
+        """Applies (path, data or None to delete, merge) writes in one transaction."""
+        with self._lock, self._conn:
+            for path, data, merge in operations:
+                if data is None:
+                    self._conn.execute("DELETE FROM documents WHERE path = ?", (path,)); continue
+                if merge:
+                    row = self._conn.execute("SELECT data FROM documents WHERE path = ?", (path,)).fetchone()
+                    data = {**(json.loads(row[0]) if row else {}), **data}
+                self._conn.execute("INSERT OR REPLACE INTO documents (path, parent, data) VALUES (?, ?, ?)",
+                                   (path, path.rsplit("/", 1)[0], json.dumps(data, default=_json_default)))
+
+    def collection(self, name: str) -> LocalCollectionReference:
+        return LocalCollectionReference(self, name)
+
+    def batch(self) -> LocalWriteBatch:
+        return LocalWriteBatch(self)
+
+    def get_all(self, references):
+        return [LocalSnapshot(reference, self.read(reference.path)) for reference in references]
+
+
+# --- Model ---
+CANNED_ANALYSIS = ("Today's front page leads on its main story. This analysis was produced by the canned local model, "
+                   "so no Gemini request was made.")
+CANNED_ARTICLES = [
+    {"type": "headline", "text": "CANNED HEADLINE"},
+    {"type": "subheading", "text": "Produced offline by the local model client"},
+    {"type": "body_text", "text": "No text was extracted from this image."},
+]
+
+
+def canned_response(text: str, prompt_tokens: int = 0, output_tokens: int = 0, function_call=None) -> SimpleNamespace:
+    """A response object with the attributes the upload script reads from Gemini's."""
+    part = SimpleNamespace(function_call=function_call)
+    return SimpleNamespace(text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+                           usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                                                          total_token_count=prompt_tokens + output_tokens))
+
+
+class CannedModelClient(ModelClient):
+    """Answers instantly with fixed, valid responses: combined JSON when a response
+    schema is given, analysis text when tools are offered, structured OCR otherwise."""
+
+    def generate(self, model_name: str, contents: list, tools: list | None = None, generation_config: dict | None = None,
+                 timeout: float | None = None):
+        if (generation_config or {}).get("response_schema"):
+            return canned_response(json.dumps({"analysis": CANNED_ANALYSIS, "articles": CANNED_ARTICLES}))
+        if tools:
+            return canned_response(CANNED_ANALYSIS)
+        return canned_response(json.dumps({"articles": CANNED_ARTICLES}))
+
+    def function_response(self, name: str, response: dict):
+        return {"function_response": {"name": name, "response": response}}
+
+
+def local_backends(directory: str, base_url: str | None = None) -> Backends:
+    """Backends that keep everything under `directory`: documents.sqlite and storage/."""
+    os.makedirs(directory, exist_ok=True)
+    return Backends(store=LocalDocumentStore(os.path.join(directory, "documents.sqlite")),
+                    storage=LocalStorageBackend(os.path.join(directory, "storage"), base_url),
+                    model=CannedModelClient(), name="local")
@@ -0,0 +1,79 @@
+# ===================================================================================
+# === manifest.py                                                                 ===
+# === Content-hash manifest so repeat runs can skip unchanged front pages         ===
+# ===================================================================================
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+MANIFEST_DOCUMENT_ID = "latest"
+
+
+def url_key(url: str) -> str:
+    """A fixed-length key for `url`, for stores keyed by image URL."""
+    # Firestore map keys can't contain '/' or '.', so entries are keyed by a hash of the URL.
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+class ContentManifest:
+    """Remembers, per image URL, the SHA-256 of the bytes last processed and the
+    Firestore docs they produced.
+
+    The manifest lives either in a local JSON file (handy as a CI artifact) or in a
+    single Firestore document, so loading and saving it costs one round trip each.
+    """
+
+    def __init__(self, entries: dict | None = None):
+        self.entries = entries or {}
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def unchanged(self, url: str, digest: str, existing_doc_ids: set | None = None) -> list[str] | None:
+        """Returns the doc ids to keep if `url` still has the same bytes, else None."""
+        entry = self.entries.get(url_key(url))
+        if not entry or entry.get("sha256") != digest or not entry.get("doc_ids"):
+            return None
+        if existing_doc_ids is not None and not set(entry["doc_ids"]) <= existing_doc_ids:
+            return None  # Someone removed the docs since; process the paper again.
+        return list(entry["doc_ids"])
+
+    def changed(self, url: str, digest: str) -> bool:
+        """Whether `url` was processed before with other bytes, i.e. it's an updated page."""
+        entry = self.entries.get(url_key(url))
+        return bool(entry) and entry.get("sha256") != digest
+
+    def record(self, url: str, digest: str, doc_ids: list[str]):
+        self.entries[url_key(url)] = {
+            "url": url, "sha256": digest, "doc_ids": list(doc_ids),
+            "updated": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def prune(self, urls):
+        """Drops entries for URLs that are no longer in the feed."""
+        keep = {url_key(url) for url in urls}
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keep}
+
+    # --- Local JSON file ---
+    @classmethod
+    def load_json(cls, path: str) -> "ContentManifest":
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("entries", {}))
+
+    def save_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, indent=2)
+
+    # --- Firestore document ---
+    @classmethod
+    def load_firestore(cls, db, collection_name: str) -> "ContentManifest":
+        doc = db.collection(collection_name).document(MANIFEST_DOCUMENT_ID).get()
+        return cls((doc.to_dict() or {}).get("entries", {}) if doc.exists else {})
+
+    def save_firestore(self, db, collection_name: str):
+        db.collection(collection_name).document(MANIFEST_DOCUMENT_ID).set({"entries": self.entries})
@@ -0,0 +1,58 @@
+# ===================================================================================
+# === newspaper_titles.py                                                         ===
+# === Maps feed titles to newspaper_details docs with one precompiled regex, and  ===
+# === keeps the whole collection in memory for the run                            ===
+# ===================================================================================
+
+import re
+
+from upload_to_static_newspaper_details_collection import NEWSPAPER_DATA, TITLE_ALIASES
+
+_unknown_ids = set(TITLE_ALIASES) - set(NEWSPAPER_DATA)
+assert not _unknown_ids, f"TITLE_ALIASES refers to papers missing from NEWSPAPER_DATA: {_unknown_ids}"
+
+# Words that don't tell one paper or edition from another.
+FILLER_WORDS = {"the", "front", "page", "pages", "newspaper", "cover"}
+
+_ALIAS_TO_ID = {alias: doc_id for doc_id, aliases in TITLE_ALIASES.items() for alias in aliases}
+# Single words only count as the whole title ("Times", not "Glasgow Times"); phrases go in
+# one regex, longest first, so "financial times" wins over "the times" at the same position.
+_WORD_TO_ID = {alias: doc_id for alias, doc_id in _ALIAS_TO_ID.items() if " " not in alias}
+_PHRASE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(alias).replace(r"\ ", r"\s+") for alias in sorted(set(_ALIAS_TO_ID) - set(_WORD_TO_ID), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def normalise_title(title: str) -> str:
+    """A title's lower-case words without punctuation, bare numbers or filler words
+    ("The Guardian - front page 2" → "guardian")."""
+    words = re.sub(r"[^\w\s]|_", " ", title.lower()).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS and not word.isdigit())
+
+
+def match_newspaper_id(title: str) -> str | None:
+    """Returns the newspaper_details doc id for a feed title, or None if no alias matches."""
+    doc_id = _WORD_TO_ID.get(normalise_title(title))
+    if doc_id: return doc_id
+    match = _PHRASE_PATTERN.search(title.replace("-", " ").replace("_", " "))
+    return _ALIAS_TO_ID[" ".join(match.group(1).lower().split())] if match else None
+
+
+class NewspaperDetailsIndex:
+    """The newspaper_details collection, read with a single stream() per run."""
+
+    def __init__(self, details_by_id: dict[str, dict]):
+        self.details_by_id = details_by_id
+
+    @classmethod
+    def load(cls, db, collection_name: str) -> "NewspaperDetailsIndex":
+        return cls({doc.id: doc.to_dict() for doc in db.collection(collection_name).stream()})
+
+    def lookup(self, title: str) -> dict:
+        doc_id = match_newspaper_id(title)
+        if not doc_id: print(f"   - ⚠️ No newspaper details found for title: {title}"); return {}
+        details = self.details_by_id.get(doc_id)
+        if details is None: print(f"   - ⚠️ Document '{doc_id}' not found."); return {}
+        print(f"   - 📖 Found details for '{doc_id}'.")
+        return details
@@ -0,0 +1,243 @@
+# ===================================================================================
+# === ocr_index.py                                                                ===
+# === Inverted index over the structured OCR of every paper, kept for a rolling   ===
+# === window of editions and sharded by term prefix so a query reads a few files  ===
+# ===================================================================================
+"""Static layout (the same JSON whether it's files or Firestore documents):
+
+    meta.json           {"version": 1, "prefix_length": 2, "next_id": N, "updated": iso,
+                         "papers": {"<id>": {"key", "title", "date", "doc", "image"}}}
+    terms/<ab>.json     {"terms": {"<term>": [[<id>, <field bits>, <count>], ...]}}
+    shards/<date>.json  {"<id>": ["ab", ...]}: the term shards of each paper of that date
+                        (only the writer reads these)
+
+A term lives in the shard named after its first `prefix_length` characters ("_" for
+anything outside a-z/0-9). Field bits: 1 headline, 2 subheading, 4 body_text, 8 caption.
+To answer a query, tokenise it the way `tokenise` does, fetch each term's shard,
+intersect the paper ids and look them up in meta.json.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+
+INDEX_VERSION = 1
+PREFIX_LENGTH = 2
+INDEX_DAYS = int(os.environ.get("OCR_INDEX_DAYS", "30"))  # Editions kept in the index
+FIELD_BITS = {"headline": 1, "subheading": 2, "body_text": 4, "caption": 8}
+# Added to a paper's score once per query term for each field the term appears in.
+FIELD_WEIGHTS = {"headline": 5, "subheading": 3, "body_text": 0, "caption": 1}
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before but by can could did do does for from had has have he her his
+how i if in into is it its just more most my new no not of on one or our out over she so than that the their them then there
+they this to up was we were what when which who will with would you your
+""".split())
+
+
+def tokenise(text: str) -> list[str]:
+    """Lower-case, accent-free words of 2+ characters, minus stopwords and possessive 's."""
+    text = unicodedata.normalize("NFKD", text.casefold().replace("’", "'"))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    terms = []
+    for word in TOKEN_PATTERN.findall(text):
+        if word.endswith("'s"): word = word[:-2]
+        word = word.replace("'", "")
+        if len(word) > 1 and word not in STOPWORDS: terms.append(word)
+    return terms
+
+
+def shard_name(term: str) -> str:
+    prefix = term[:PREFIX_LENGTH]
+    return prefix if re.fullmatch(r"[a-z0-9]+", prefix) else "_"
+
+
+# --- Where the index files live ---
+class DirectoryIndexStore:
+    """meta.json and terms/*.json under `path` (e.g. published with the feeds on GitHub Pages)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self, name: str) -> dict | None:
+        try:
+            with open(os.path.join(self.path, f"{name}.json"), "r", encoding="utf-8") as f: return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write(self, name: str, data: dict):
+        path = os.path.join(self.path, f"{name}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f: json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)  # Readers never see half a shard
+
+    def delete(self, name: str):
+        with contextlib.suppress(FileNotFoundError): os.remove(os.path.join(self.path, f"{name}.json"))
+
+
+class FirestoreIndexStore:
+    """One document per file in `collection_name` ("terms/ab" → "terms_ab").
+
+    The JSON is stored as a single string field: as maps, the postings would need
+    one Firestore index entry per term and overrun the per-document limit.
+    """
+
+    def __init__(self, db, collection_name: str):
+        self.db, self.collection_name = db, collection_name
+
+    def _document(self, name: str):
+        return self.db.collection(self.collection_name).document(name.replace("/", "_"))
+
+    def read(self, name: str) -> dict | None:
+        doc = self._document(name).get()
+        return json.loads(doc.get("json")) if doc.exists else None
+
+    def write(self, name: str, data: dict):
+        self._document(name).set({"json": json.dumps(data, separators=(",", ":"), ensure_ascii=False)})
+
+    def delete(self, name: str):
+        self._document(name).delete()
+
+
+class OcrIndex:
+    """Postings for every paper's OCR articles, updated incrementally.
+
+    Shards are read only when a term (or a removed paper) needs them, and `save`
+    writes back just the ones that changed. Re-adding a paper key replaces it.
+    """
+
+    def __init__(self, store, days: int = INDEX_DAYS):
+        self.store = store
+        self.days = days
+        meta = store.read("meta") or {}
+        if meta.get("version") != INDEX_VERSION or meta.get("prefix_length") != PREFIX_LENGTH: meta = {}
+        self.papers = {int(paper_id): paper for paper_id, paper in meta.get("papers", {}).items()}
+        self.next_id = meta.get("next_id", 0)
+        self._ids_by_key = {paper["key"]: paper_id for paper_id, paper in self.papers.items()}
+        self._paper_shards = {}  # date → {paper id: shard names}, read as papers of that date are added/removed
+        self._dirty_dates = set()
+        self._shards = {}
+        self._dirty = set()
+
+    def _shard(self, name: str) -> dict:
+        if name not in self._shards:
+            self._shards[name] = (self.store.read(f"terms/{name}") or {}).get("terms", {})
+        return self._shards[name]
+
+    def _shards_of(self, paper_date: str | None) -> dict:
+        paper_date = paper_date or "undated"
+        if paper_date not in self._paper_shards:
+            stored = self.store.read(f"shards/{paper_date}") or {}
+            self._paper_shards[paper_date] = {int(paper_id): names for paper_id, names in stored.items()}
+        self._dirty_dates.add(paper_date)
+        return self._paper_shards[paper_date]
+
+    def remove(self, *keys: str):
+        """Drops papers by key, reading each shard they touched once."""
+        paper_ids = {self._ids_by_key.pop(key) for key in keys if key in self._ids_by_key}
+        names = sorted({name for paper_id in paper_ids for name in self._shards_of(self.papers.pop(paper_id).get("date")).pop(paper_id, [])})
+        for name in names:
+            shard = self._shard(name)
+            for term in list(shard):
+                postings = [posting for posting in shard[term] if posting[0] not in paper_ids]
+                if postings: shard[term] = postings
+                else: del shard[term]
+        self._dirty.update(names)
+
+    def add(self, key: str, articles: list[dict], title: str, paper_date: str, doc: str | None = None, image: str | None = None):
+        """Indexes one paper's OCR articles under `key` (e.g. "2024-05-01/times")."""
+        self.remove(key)
+        counts, fields = {}, {}
+        for article in articles:
+            bit = FIELD_BITS.get(article.get("type"), FIELD_BITS["body_text"])
+            for term in tokenise(str(article.get("text", ""))):
+                counts[term] = counts.get(term, 0) + 1
+                fields[term] = fields.get(term, 0) | bit
+        paper_id, self.next_id = self.next_id, self.next_id + 1
+        shards = set()
+        for term, count in counts.items():
+            name = shard_name(term)
+            self._shard(name).setdefault(term, []).append([paper_id, fields[term], count])
+            shards.add(name)
+        self._dirty |= shards
+        self.papers[paper_id] = {"key": key, "title": title, "date": paper_date, "doc": doc, "image": image}
+        self._shards_of(paper_date)[paper_id] = sorted(shards)
+        self._ids_by_key[key] = paper_id
+
+    def prune(self, today: date | None = None) -> int:
+        """Drops papers older than `days`; returns how many went."""
+        cutoff = ((today or datetime.now(timezone.utc).date()) - timedelta(days=self.days)).isoformat()
+        expired = [paper["key"] for paper in self.papers.values() if (paper.get("date") or "") < cutoff]
+        self.remove(*expired)
+        return len(expired)
+
+    def save(self) -> int:
+        """Writes the changed term and per-date shard lists, then meta.json; returns how many term shards were written."""
+        for name in sorted(self._dirty): self.store.write(f"terms/{name}", {"terms": self._shards[name]})
+        for paper_date in sorted(self._dirty_dates):
+            papers = self._paper_shards[paper_date]
+            if papers: self.store.write(f"shards/{paper_date}", {str(paper_id): names for paper_id, names in sorted(papers.items())})
+            else: self.store.delete(f"shards/{paper_date}")
+        self._dirty_dates = set()
+        self.store.write("meta", {
+            "version": INDEX_VERSION, "prefix_length": PREFIX_LENGTH, "next_id": self.next_id,
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "papers": {str(paper_id): paper for paper_id, paper in sorted(self.papers.items())},
+        })
+        written, self._dirty = len(self._dirty), set()
+        return written
+
+    def search(self, query: str, since: str | None = None, until: str | None = None, fields=None, limit: int = 20) -> list[dict]:
+        """Papers containing every term of `query`, best first.
+
+        `since`/`until` are inclusive YYYY-MM-DD bounds; `fields` (e.g. ["headline"])
+        requires each term to appear in one of those article types.
+        """
+        terms = list(dict.fromkeys(tokenise(query)))
+        if not terms: return []
+        required = sum(FIELD_BITS[field] for field in fields) if fields else 0
+        scores, matched_fields = None, {}
+        for term in terms:
+            term_scores = {}
+            for paper_id, bits, count in self._shard(shard_name(term)).get(term, []):
+                if required and not bits & required: continue
+                term_scores[paper_id] = count + sum(weight for field, weight in FIELD_WEIGHTS.items() if bits & FIELD_BITS[field])
+                matched_fields[paper_id] = matched_fields.get(paper_id, 0) | bits
+            scores = term_scores if scores is None else {paper_id: score + term_scores[paper_id] for paper_id, score in scores.items() if paper_id in term_scores}
+            if not scores: return []
+        hits = []
+        for paper_id, score in scores.items():
+            paper = self.papers.get(paper_id)
+            if not paper: continue
+            if (since and (paper.get("date") or "") < since) or (until and (paper.get("date") or "") > until): continue
+            hits.append({**{field: paper[field] for field in ("key", "title", "date", "doc", "image")}, "score": score,
+                         "fields": [field for field, bit in FIELD_BITS.items() if matched_fields[paper_id] & bit]})
+        hits.sort(key=lambda hit: (hit["score"], hit["date"] or ""), reverse=True)
+        return hits[:limit]
+
+
+def search(query: str, directory: str = "ocr_index", days: int | None = None, headlines_only: bool = False, limit: int = 20) -> list[dict]:
+    """Searches a static index directory, e.g. search("rail strike", days=7, headlines_only=True)
+    for the papers that led with it this week."""
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat() if days else None
+    return OcrIndex(DirectoryIndexStore(directory)).search(query, since=since, fields=["headline"] if headlines_only else None, limit=limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the OCR index of recent front pages.")
+    parser.add_argument("query")
+    parser.add_argument("--index-dir", default="ocr_index")
+    parser.add_argument("--days", type=int, help="only papers from the last N days")
+    parser.add_argument("--headlines", action="store_true", help="only match text in headlines")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    for hit in search(args.query, args.index_dir, args.days, args.headlines, args.limit):
+        print(f"{hit['date']}  {hit['title']:<30}  score {hit['score']:>3}  ({', '.join(hit['fields'])})  {hit['doc']}")
+
+
+if __name__ == "__main__":
+    main()
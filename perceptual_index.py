@@ -0,0 +1,151 @@
+# ===================================================================================
+# === perceptual_index.py                                                         ===
+# === Difference hashes of front pages, per paper date, to catch the same scan    ===
+# === under another URL, a recompressed copy, or a "coming soon" placeholder      ===
+# ===================================================================================
+
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageStat
+
+from manifest import url_key
+
+HASH_SIZE = 8  # 8x8 gradient bits = a 64-bit hash
+# Hashes at most this many bits apart are candidates for the same page. Recompressed or
+# rescaled copies stay within 2; a new headline on the same layout can be as close as 3.
+MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", "3"))
+# Candidates must also match pixel for pixel: a THUMB_SIZE grayscale thumbnail is compared
+# in THUMB_CELL-pixel cells, and no cell may differ by more than this on average (0-255).
+# Recompression moves every cell by ~1; a swapped headline moves its cells by 30+.
+THUMB_SIZE = 32
+THUMB_CELL = 4
+MAX_CELL_DIFFERENCE = float(os.environ.get("PHASH_MAX_CELL_DIFFERENCE", "8"))
+# Real scans are ~1000px across and full of contrast; placeholders are small or nearly flat.
+MIN_SCAN_EDGE = int(os.environ.get("PHASH_MIN_SCAN_EDGE", "300"))
+MIN_CONTRAST = float(os.environ.get("PHASH_MIN_CONTRAST", "12"))
+# Hashes of placeholder images seen in the wild, as comma-separated hex.
+KNOWN_PLACEHOLDERS = [int(value, 16) for value in os.environ.get("PHASH_PLACEHOLDERS", "").split(",") if value.strip()]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def pixel_difference(a: bytes, b: bytes) -> float:
+    """The largest average difference over the THUMB_CELL cells of two thumbnails."""
+    size = (THUMB_SIZE, THUMB_SIZE)
+    diff = ImageChops.difference(Image.frombytes("L", size, a), Image.frombytes("L", size, b))
+    return float(diff.reduce(THUMB_CELL).getextrema()[1])
+
+
+def fingerprint(data: bytes) -> tuple[int, bytes, bool]:
+    """Returns the image's dHash, its grayscale thumbnail and whether it looks like a
+    placeholder rather than a scan.
+
+    JPEGs are decoded at reduced scale (draft mode), so this costs a few milliseconds.
+    """
+    with Image.open(BytesIO(data)) as img:
+        full_size = img.size
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        gray = img.convert("L")
+    contrast = ImageStat.Stat(gray).stddev[0]
+    thumbnail = gray.resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS).tobytes()
+    pixels = list(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            value = (value << 1) | (left > pixels[row * (HASH_SIZE + 1) + col + 1])
+    placeholder = (max(full_size) < MIN_SCAN_EDGE or contrast < MIN_CONTRAST
+                   or any(hamming(value, known) <= MAX_DISTANCE for known in KNOWN_PLACEHOLDERS))
+    return value, thumbnail, placeholder
+
+
+class PerceptualIndex:
+    """Per paper date, the dHash of every page published and the docs it produced.
+
+    `claim` is called as each page is downloaded: the first page with a given look
+    is claimed for this run, and a later near-duplicate either reuses a previous
+    run's docs or is dropped as a copy of a page already in flight. Only pages under
+    other URLs count: a URL whose bytes changed is a new edition, however alike it
+    looks. Like the content manifest, it lives in a local JSON file or in Firestore,
+    where each date is one document read the first time a page of that date turns up.
+    """
+
+    def __init__(self, dates: dict | None = None, load_date=None, max_distance: int = MAX_DISTANCE):
+        self.dates = dates or {}  # date → {url: {"dhash", "thumb", "url", "title", "sha256", "doc_ids", "updated"}}
+        self.updated_dates = set()
+        self.max_distance = max_distance
+        self._load_date = load_date
+        self._claims = {}  # date → {url: {"url", "dhash", "thumb"}} of pages being processed this run
+        self._lock = threading.Lock()
+
+    def _entries(self, date: str) -> dict:
+        if date not in self.dates:
+            self.dates[date] = self._load_date(date) if self._load_date else {}
+        return self.dates[date]
+
+    def _nearest(self, date: str, value: int, thumbnail: bytes, url: str) -> dict | None:
+        candidates = [entry for entry in [*self._entries(date).values(), *self._claims.get(date, {}).values()]
+                      if entry["url"] != url and entry.get("thumb")]  # Entries from before thumbnails never match
+        close = sorted(((hamming(value, int(entry["dhash"], 16)), entry) for entry in candidates), key=lambda pair: pair[0])
+        return next((entry for distance, entry in close if distance <= self.max_distance
+                     and pixel_difference(thumbnail, base64.b64decode(entry["thumb"])) <= MAX_CELL_DIFFERENCE), None)
+
+    def claim(self, date: str, value: int, thumbnail: bytes, url: str, existing_doc_ids: set | None = None,
+              match: bool = True) -> dict | None:
+        """Returns the entry this page duplicates, or None after claiming it for this run.
+
+        A returned entry without "doc_ids" is a page another item of this run is
+        processing; one with "doc_ids" is a previous run's page whose docs still exist.
+        With `match=False` (e.g. the URL's bytes changed) the page is only claimed.
+        """
+        with self._lock:
+            entry = self._nearest(date, value, thumbnail, url) if match else None
+            if entry and entry.get("doc_ids") and existing_doc_ids is not None and not set(entry["doc_ids"]) <= existing_doc_ids:
+                entry = None  # Someone removed the docs since; process the page again.
+            if entry is None:
+                self._claims.setdefault(date, {})[url] = {"url": url, "dhash": f"{value:016x}", "thumb": base64.b64encode(thumbnail).decode("ascii")}
+            return entry
+
+    def record(self, date: str, value: int, thumbnail: bytes, url: str, title: str, sha256: str, doc_ids: list[str]):
+        with self._lock:
+            self._entries(date)[url] = {
+                "dhash": f"{value:016x}", "thumb": base64.b64encode(thumbnail).decode("ascii"), "url": url, "title": title,
+                "sha256": sha256, "doc_ids": list(doc_ids), "updated": datetime.now(timezone.utc).isoformat(),
+            }
+            self.updated_dates.add(date)
+
+    # --- Local JSON file ---
+    @classmethod
+    def load_json(cls, path: str) -> "PerceptualIndex":
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("dates", {}))
+
+    def save_json(self, path: str, keep_dates=None):
+        """Writes the index, keeping only `keep_dates` (e.g. the dates still in the feed) if given."""
+        dates = self.dates if keep_dates is None else {date: self.dates[date] for date in set(keep_dates) if date in self.dates}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"dates": dates}, f, indent=2)
+
+    # --- Firestore documents, one per date ---
+    @classmethod
+    def for_firestore(cls, db, collection_name: str) -> "PerceptualIndex":
+        def load_date(date: str) -> dict:
+            doc = db.collection(collection_name).document(date).get()
+            entries = (doc.to_dict() or {}).get("entries", {}) if doc.exists else {}
+            return {entry["url"]: entry for entry in entries.values()}
+        return cls(load_date=load_date)
+
+    def save_firestore(self, db, collection_name: str):
+        """Writes the dates recorded into this run."""
+        for date in sorted(self.updated_dates):
+            entries = {url_key(entry["url"]): entry for entry in self.dates[date].values()}
+            db.collection(collection_name).document(date).set({"entries": entries})
@@ -0,0 +1,101 @@
+# ===================================================================================
+# === pipeline.py                                                                 ===
+# === A small stage-pipelined executor used by the upload script                  ===
+# ===================================================================================
+
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import instrumentation
+
+
+@dataclass
+class Stage:
+    """One step of the pipeline with its own bounded pool of workers.
+
+    `fn` receives the value produced by the previous stage and returns the value
+    for the next one. Returning None drops the item from the rest of the pipeline.
+    Process stages need a picklable, module-level `fn` and picklable values.
+    """
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 4
+    use_processes: bool = False
+
+
+@dataclass
+class Finished:
+    """Return Finished(result) from a stage to end the item's run early with `result`."""
+    result: Any
+
+
+def _run_timed(fn: Callable[[Any], Any], value: Any) -> tuple[Any, float, float]:
+    """Runs a thread stage, returning (result, start time, seconds) so queueing isn't counted."""
+    start, started = time.time(), time.perf_counter()
+    return fn(value), start, time.perf_counter() - started
+
+
+def _run_timed_in_process(fn: Callable[[Any], Any], value: Any) -> tuple[Any, float, float, dict]:
+    """Like _run_timed in a worker process, also handing back the spans/counters recorded there."""
+    instrumentation.recorder().drain()  # Anything left over from an earlier task was already reported
+    result, start, seconds = _run_timed(fn, value)
+    return result, start, seconds, instrumentation.recorder().drain()
+
+
+class StagePipeline:
+    """Runs every item through the stages, overlapping items across stages.
+
+    Each stage has its own executor, so paper N+1 can be downloading while paper N
+    is being analysed and paper N-1 is uploading. A failure in any stage only drops
+    the item it happened on. Each stage call is recorded as a `stage.<name>` span,
+    excluding the time spent waiting for a worker.
+    """
+
+    def __init__(self, stages: list[Stage], label: Callable[[Any], str] = str):
+        self.stages = stages
+        self.label = label
+
+    def _make_executor(self, stage: Stage):
+        workers = max(1, stage.workers)
+        if stage.use_processes:
+            # "spawn" keeps gRPC/Firebase threads of the parent out of the workers.
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=stage.name)
+
+    def _drive(self, executors: dict, item: Any) -> Any:
+        value = item
+        for stage in self.stages:
+            try:
+                if stage.use_processes:
+                    value, start, seconds, snapshot = executors[stage.name].submit(_run_timed_in_process, stage.fn, value).result()
+                    instrumentation.recorder().merge(snapshot)
+                else:
+                    value, start, seconds = executors[stage.name].submit(_run_timed, stage.fn, value).result()
+                instrumentation.record_span(f"stage.{stage.name}", seconds, start, ok=value is not None)
+            except Exception as e:
+                instrumentation.count("pipeline.stage_failures", stage=stage.name)
+                print(f" ❌ Stage '{stage.name}' failed for {self.label(item)}: {e}")
+                traceback.print_exc()
+                return None
+            if value is None:
+                return None
+            if isinstance(value, Finished):
+                return value.result
+        return value
+
+    def run(self, items: list) -> list:
+        """Returns one result per item, in input order (None for dropped items)."""
+        if not items:
+            return []
+        executors = {stage.name: self._make_executor(stage) for stage in self.stages}
+        try:
+            # One lightweight driver thread per item; the stage pools bound the real work.
+            with ThreadPoolExecutor(max_workers=len(items), thread_name_prefix="paper") as drivers:
+                return list(drivers.map(lambda item: self._drive(executors, item), items))
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
@@ -0,0 +1,87 @@
+# ===================================================================================
+# === publisher.py                                                                ===
+# === Diff-based, batched Firestore publishing                                    ===
+# ===================================================================================
+
+import hashlib
+import time
+
+import instrumentation
+
+MAX_BATCH_OPS = 500  # Firestore's limit on writes per WriteBatch
+
+
+def list_document_ids(db, collection_name: str) -> set[str]:
+    """Reads the ids in a collection without fetching any document data."""
+    return {ref.id for ref in db.collection(collection_name).list_documents()}
+
+
+def commit_in_batches(db, operations) -> int:
+    """Applies ("set" | "delete", doc_ref, data) operations in 500-op WriteBatch commits.
+
+    Returns the number of commits made.
+    """
+    commits = 0
+    batch, pending = db.batch(), 0
+
+    def commit():
+        with instrumentation.span("firestore.commit", ops=pending): batch.commit()
+        instrumentation.count("firestore.writes", pending)
+
+    for op, doc_ref, data in operations:
+        if op == "set": batch.set(doc_ref, data)
+        else: batch.delete(doc_ref)
+        pending += 1
+        if pending == MAX_BATCH_OPS:
+            commit(); commits += 1
+            batch, pending = db.batch(), 0
+    if pending:
+        commit(); commits += 1
+    return commits
+
+
+def publish_documents(db, collection_name: str, desired: dict[str, dict], existing_ids: set[str],
+                      keep: set[str] = frozenset()) -> dict:
+    """Makes the collection match `desired`, touching only what changed.
+
+    Docs in `desired` are created or overwritten, ids in `keep` are left as they
+    are, and every other existing doc is deleted. All writes go out together at the
+    end of the run, so the app never sees an emptied collection.
+    """
+    collection_ref = db.collection(collection_name)
+    creates = [doc_id for doc_id in desired if doc_id not in existing_ids]
+    updates = [doc_id for doc_id in desired if doc_id in existing_ids]
+    deletes = sorted(existing_ids - set(desired) - set(keep))
+    operations = [("set", collection_ref.document(doc_id), desired[doc_id]) for doc_id in creates + updates]
+    operations += [("delete", collection_ref.document(doc_id), None) for doc_id in deletes]
+    commits = commit_in_batches(db, operations)
+    stats = {"created": len(creates), "updated": len(updates), "deleted": len(deletes),
+             "kept": len(set(keep) & existing_ids), "commits": commits}
+    print(f"📤 Published to {collection_name}: {stats['created']} created, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {stats['kept']} kept ({commits} batch commits).")
+    return stats
+
+
+def analysis_lookup_id(image_url: str) -> str:
+    """The analysis_lookup doc id for an image URL; functions/index.js hashes the same way."""
+    return hashlib.sha256(image_url.encode("utf-8")).hexdigest()
+
+
+def publish_analysis_lookup(db, collection_name: str, entries: dict[str, dict]) -> int:
+    """Writes one image-URL-hash → analysis doc per URL in `entries`; returns the commit count.
+
+    Each entry is stamped with its "created" time (epoch seconds) for prune_analysis_lookup.
+    """
+    collection_ref = db.collection(collection_name)
+    created = time.time()
+    operations = [("set", collection_ref.document(analysis_lookup_id(url)), {**entry, "imageUrl": url, "created": created})
+                  for url, entry in sorted(entries.items())]
+    return commit_in_batches(db, operations)
+
+
+def prune_analysis_lookup(db, collection_name: str, max_age_seconds: float) -> int:
+    """Deletes lookup entries created more than `max_age_seconds` ago; returns how many."""
+    cutoff = time.time() - max_age_seconds
+    stale = [doc.reference for doc in db.collection(collection_name).select(["created"]).stream() if (doc.get("created") or 0) < cutoff]
+    commit_in_batches(db, (("delete", ref, None) for ref in stale))
+    return len(stale)
@@ -0,0 +1,130 @@
+# ===================================================================================
+# === rate_limit.py                                                               ===
+# === Adaptive token-bucket limiters for Gemini Pro, Gemini Flash and Search      ===
+# ===================================================================================
+
+import contextlib
+import os
+import threading
+import time
+
+import instrumentation
+
+# Per-API quota and concurrency; requests per minute are overridable from the environment.
+LIMITS = {
+    "gemini-pro": {"requests_per_minute": float(os.environ.get("GEMINI_PRO_RPM", "60")), "max_concurrency": 4, "target_latency": 90},
+    "gemini-flash": {"requests_per_minute": float(os.environ.get("GEMINI_FLASH_RPM", "300")), "max_concurrency": 8, "target_latency": 45},
+    "search": {"requests_per_minute": float(os.environ.get("GOOGLE_SEARCH_RPM", "90")), "max_concurrency": 4, "target_latency": 10},
+}
+SLOW_DECREASE = 0.75  # Concurrency multiplier after a call slower than target_latency
+THROTTLED_DECREASE = 0.5  # ... and after a 429
+MAX_COOLDOWN_SECONDS = 30
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """429 / RESOURCE_EXHAUSTED from google-api-core, requests or a plain message."""
+    if getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429 or "429" in str(error)
+
+
+class _Call:
+    throttled = False
+
+
+class AdaptiveRateLimiter:
+    """A token bucket for the per-minute quota plus an AIMD concurrency limit.
+
+    Every fast success raises the concurrency limit by 1/limit (about +1 per round of
+    calls); a call slower than `target_latency` or a 429 cuts it multiplicatively, and
+    a 429 also empties the bucket and pauses new calls for an exponential cooldown.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, max_concurrency: int, min_concurrency: int = 1,
+                 target_latency: float | None = None):
+        self.name = name
+        self.rate = requests_per_minute / 60
+        self.capacity = max(1.0, float(max_concurrency))  # Burst size
+        self.tokens = self.capacity
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.throttled_count = 0
+        self._consecutive_throttles = 0
+        self._blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until the bucket has a token and a concurrency slot is free."""
+        start = time.perf_counter()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self.tokens >= 1 and self.in_flight < int(self.concurrency_limit):
+                    self.tokens -= 1; self.in_flight += 1
+                    break
+                waits = [self._blocked_until - now] if now < self._blocked_until else []
+                if self.tokens < 1: waits.append((1 - self.tokens) / self.rate if self.rate else 1.0)
+                self._condition.wait(max(0.01, min(waits)) if waits else None)  # Otherwise woken by release()
+        waited = time.perf_counter() - start
+        if waited > 0.01: instrumentation.record_span("rate_limit.wait", waited, api=self.name)
+
+    def release(self, latency: float, throttled: bool = False):
+        """Returns the slot and adapts the concurrency limit to how the call went."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled_count += 1
+                self._consecutive_throttles += 1
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * THROTTLED_DECREASE)
+                self.tokens = 0
+                cooldown = min(MAX_COOLDOWN_SECONDS, 2 ** self._consecutive_throttles)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+                print(f"   - 🚦 {self.name} throttled (429); concurrency {self.concurrency_limit:.1f}, pausing {cooldown}s.")
+            else:
+                self._consecutive_throttles = 0
+                if self.target_latency and latency > self.target_latency:
+                    self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * SLOW_DECREASE)
+                else:
+                    self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            self._condition.notify_all()
+        if throttled: instrumentation.count("rate_limit.throttled", api=self.name)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """`with limiter.slot() as call:` around one request; set `call.throttled = True`
+        when a response (rather than an exception) reports a 429."""
+        self.acquire()
+        call = _Call()
+        start = time.monotonic()
+        try:
+            yield call
+        except Exception as e:
+            call.throttled = call.throttled or is_throttle_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - start, call.throttled)
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api: str) -> AdaptiveRateLimiter:
+    """The process-wide limiter for one of the APIs in LIMITS."""
+    with _limiters_lock:
+        if api not in _limiters: _limiters[api] = AdaptiveRateLimiter(api, **LIMITS[api])
+        return _limiters[api]
+
+
+def limiter_for_model(model_name: str) -> AdaptiveRateLimiter:
+    return get_limiter("gemini-flash" if "flash" in model_name else "gemini-pro")
@@ -0,0 +1,68 @@
+# ===================================================================================
+# === run_nightly.py                                                              ===
+# === One process for the whole nightly run: scrape → process → publish           ===
+# ===================================================================================
+
+import argparse
+import os
+
+import generate
+import instrumentation
+
+LOCAL_FEED_PATH = "frontpages.json"
+LOCAL_BACKENDS_DIR = "local_run"  # Where --local keeps images, documents and the canned model's results
+
+
+def resolve_items(feed_path: str | None, scrape: bool, output_dir: str | None = None) -> list:
+    """Feed items from the fresh scrape, else a local frontpages.json, else the published feed URL.
+
+    With `output_dir` the scrape writes its feeds and state there rather than over the tracked ones.
+    """
+    if scrape:
+        items = generate.scrape_and_write_feeds(output_dir)
+        if items:
+            print(f"\n➡️  Handing {len(items)} scraped items straight to the upload pipeline.")
+            return items
+    # Imported here so a scrape-only run never pays for Firebase/Gemini start-up.
+    import upload_news_images_create_documents_fields as uploader
+    path = feed_path or os.path.join(output_dir or "", LOCAL_FEED_PATH)
+    if os.path.exists(path):
+        items = uploader.load_feed_file(path)
+        if items:
+            print(f"\n📂 Using {len(items)} items from local feed '{path}'.")
+            return items
+    print("\n🔄 No local items, fetching the published feed…")
+    return uploader.fetch_feed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape tonight's front pages, then process and publish them.")
+    parser.add_argument("--feed-path", help=f"process this local feed instead of scraping (default fallback: {LOCAL_FEED_PATH})")
+    parser.add_argument("--scrape-only", action="store_true", help="only update rss.xml and frontpages.json")
+    parser.add_argument("--local", nargs="?", const=LOCAL_BACKENDS_DIR, metavar="DIR",
+                        help=f"dry run against files + SQLite + a canned model under DIR (default {LOCAL_BACKENDS_DIR}/), no credentials needed; "
+                             "the scrape still reads the live site but writes its feeds and state under DIR")
+    parser.add_argument("--resume", action="store_true", help="reuse the analyses and uploads an interrupted run already finished (see journal.py)")
+    args = parser.parse_args()
+
+    try:
+        if args.scrape_only:
+            generate.scrape_and_write_feeds(args.local); return
+
+        items = resolve_items(args.feed_path, scrape=not args.feed_path, output_dir=args.local)
+        if not items: print("   → No items found in feed."); return
+        import upload_news_images_create_documents_fields as uploader
+        backends = ocr_index_dir = None
+        if args.local:
+            from local_backends import local_backends
+            backends = local_backends(args.local)
+            ocr_index_dir = os.path.join(args.local, uploader.OCR_INDEX_DIR)
+            print(f"\n🧪 Local run: publishing to '{args.local}/' instead of Firebase and Gemini.")
+        uploader.upload_items(items, backends=backends, ocr_index_dir=ocr_index_dir, resume=args.resume)
+        print("\n✔️  Done.")
+    finally:
+        instrumentation.write_report(entry="run_nightly", scrape_only=args.scrape_only)
+
+
+if __name__ == "__main__":
+    main()
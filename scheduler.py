@@ -0,0 +1,84 @@
+# ===================================================================================
+# === scheduler.py                                                                ===
+# === Run deadline: papers in priority order, Gemini work scaled down as the      ===
+# === time left runs out                                                          ===
+# ===================================================================================
+
+import os
+import threading
+import time
+
+import instrumentation
+from newspaper_titles import match_newspaper_id
+
+# The cron fires hourly, so a run must be done well before the next one starts.
+RUN_DEADLINE_SECONDS = float(os.environ.get("RUN_DEADLINE_MINUTES", "45")) * 60
+# Kept back for the image, upload and publish steps after the last Gemini call.
+PUBLISH_RESERVE_SECONDS = float(os.environ.get("RUN_PUBLISH_RESERVE_SECONDS", "180"))
+# Papers analysed first when time is short; titles that match nothing come last.
+PAPER_PRIORITY = [paper_id.strip() for paper_id in os.environ.get(
+    "PAPER_PRIORITY", "times,guardian,telegraph,ft,financial,mail,mirror,sun,express,i,independent,observer,metro,star").split(",") if paper_id.strip()]
+
+# Analysis modes, from most to least Gemini work.
+FULL = "full"  # Analysis + OCR from the model
+OCR_ONLY = "ocr_only"  # Cached analysis if there is one, OCR from Flash
+CACHED = "cached"  # Only what the Gemini cache already has
+# Starting guesses for a paper's analysis time per mode, refined as papers finish.
+INITIAL_ESTIMATES = {FULL: 45.0, OCR_ONLY: 15.0, CACHED: 0.5}
+ESTIMATE_SMOOTHING = 0.3
+
+
+def paper_priority(title: str) -> int:
+    paper_id = match_newspaper_id(title or "")
+    return PAPER_PRIORITY.index(paper_id) if paper_id in PAPER_PRIORITY else len(PAPER_PRIORITY)
+
+
+class DeadlineScheduler:
+    """Decides, as each paper reaches the analysis stage, how much Gemini work it can have.
+
+    A paper gets FULL analysis if every paper still waiting could also get it within
+    the time left (minus the publish reserve) at the current concurrency, else OCR_ONLY
+    under the same test, else CACHED. Estimates are moving averages of finished papers.
+    """
+
+    def __init__(self, budget_seconds: float = RUN_DEADLINE_SECONDS, concurrency: int = 1,
+                 reserve_seconds: float = PUBLISH_RESERVE_SECONDS):
+        self.deadline = time.monotonic() + budget_seconds
+        self.concurrency = max(1, concurrency)
+        self.reserve_seconds = reserve_seconds
+        self.estimates = dict(INITIAL_ESTIMATES)
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def prioritise(self, items: list) -> list:
+        """Items in priority order (stable within a priority); also counts them as waiting."""
+        with self._lock: self.waiting += len(items)
+        return sorted(items, key=lambda item: paper_priority(item.get('title', '')))
+
+    def cap_timeout(self, timeout: float | None = None) -> float:
+        """Keeps a request timeout (None: no limit of its own) from running past the deadline (minimum 5s)."""
+        left = self.remaining() - self.reserve_seconds
+        return max(5.0, min(timeout, left) if timeout else left)
+
+    def begin_analysis(self) -> str:
+        with self._lock:
+            available = self.remaining() - self.reserve_seconds
+            papers = max(1, self.waiting)
+            self.waiting = max(0, self.waiting - 1)
+            for mode in (FULL, OCR_ONLY):
+                if papers * self.estimates[mode] / self.concurrency <= available: break
+            else:
+                mode = CACHED
+        instrumentation.count("scheduler.papers", mode=mode)
+        return mode
+
+    def finish_analysis(self, mode: str, seconds: float):
+        with self._lock:
+            self.estimates[mode] += ESTIMATE_SMOOTHING * (seconds - self.estimates[mode])
+
+    def skip(self):
+        """A paper that will never reach the analysis stage (unchanged or failed download)."""
+        with self._lock: self.waiting = max(0, self.waiting - 1)
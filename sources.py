@@ -0,0 +1,233 @@
+# ===================================================================================
+# === sources.py                                                                  ===
+# === Front-page sources as plugins: each site's selector rules, URL clean-up and  ===
+# === title extraction, fetched concurrently and merged per newspaper             ===
+# ===================================================================================
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+
+import lxml.html
+import requests
+
+import http_client
+import instrumentation
+from newspaper_titles import normalise_title
+
+# Headers to avoid 403 blocking
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+SKIP_WORDS = ['logo', 'icon', 'avatar', 'profile']
+# Sources whose page is this much older than the freshest one are treated as yesterday's
+# edition: they lose a title to any fresher source, and titles only they have are dropped.
+FRESHNESS_TOLERANCE = timedelta(hours=float(os.environ.get("SCRAPE_FRESHNESS_TOLERANCE_HOURS", "6")))
+STALE_AFTER = timedelta(hours=float(os.environ.get("SCRAPE_STALE_AFTER_HOURS", "18")))
+# What a fetch found: new pages, a 304 (the pages stored by the last fetch), or an error (no pages).
+CHANGED, NOT_MODIFIED, FAILED = "changed", "not_modified", "failed"
+
+
+class SourcesUnavailable(requests.RequestException):
+    """Every enabled source failed to fetch."""
+
+
+@dataclass
+class FrontPage:
+    title: str
+    url: str
+    source: str = ""
+    width: int | None = None  # Largest size the source offers, from width/height or srcset
+    height: int | None = None
+    published: str | None = None  # ISO time of the source page (Last-Modified, else when fetched)
+
+    @property
+    def pixels(self) -> int:
+        return (self.width or 0) * (self.height or 0)
+
+
+def _has_ancestor(img, predicate):
+    return any(predicate(el) for el in img.iterancestors())
+
+
+def _int(value) -> int | None:
+    try: return int(value)
+    except (TypeError, ValueError): return None
+
+
+class Source:
+    """One site to scrape. A plugin sets `name`, `url` and its selector cascade, and
+    can override URL normalisation and title extraction.
+
+    `img_rules` are tried most specific first: the first rule that yields any usable
+    image decides the result. Every rule is scored in a single pass over the page.
+    """
+
+    name = "source"
+    url = ""
+    img_rules = [lambda img: True]
+    skip_words = SKIP_WORDS
+    min_edge = 100  # Skip very small images (likely logos/icons)
+    max_items = None  # No cap unless a site needs one
+
+    def normalise_url(self, src: str) -> str | None:
+        """Absolute http(s) URL for an <img> src, or None to skip it."""
+        if src.startswith("//"): return "https:" + src
+        if src.startswith("/"): return urljoin(self.url, src)
+        return src if src.startswith("http") else None
+
+    def title_from_filename(self, url: str) -> str:
+        # Extract filename from URL and clean it up
+        filename = url.split('/')[-1].split('.')[0]  # Get filename without extension
+        # Remove WordPress size suffixes and trailing numbers like "-1", "-8" first
+        filename = re.sub(r'-\d+x\d+$', '', filename)
+        filename = re.sub(r'-\d+$', '', filename)
+        # Then replace hyphens with spaces
+        return filename.replace('-', ' ').strip() or "Newspaper Front Page"
+
+    def size(self, img) -> tuple[int | None, int | None]:
+        width, height = _int(img.get("width")), _int(img.get("height"))
+        widths = [_int(candidate.split()[1][:-1]) for candidate in (img.get("srcset") or "").split(",")
+                  if len(candidate.split()) == 2 and candidate.split()[1].endswith("w")]
+        largest = max((w for w in widths if w), default=None)
+        if largest and width and height and largest > width: width, height = largest, round(height * largest / width)
+        return width, height
+
+    def extract(self, img) -> FrontPage | None:
+        """A FrontPage for a usable <img>, or None if it should be skipped."""
+        src = img.get("src") or img.get("data-src")
+        url = self.normalise_url(src) if src else None
+        if not url: return None
+        width, height = _int(img.get("width")), _int(img.get("height"))
+        if width and height and (width < self.min_edge or height < self.min_edge): return None
+        # If no alt text, extract newspaper name from filename
+        title = (img.get("alt") or "").strip() or self.title_from_filename(url)
+        # Skip images that are clearly not front pages
+        if any(word in url.lower() or word in title.lower() for word in self.skip_words): return None
+        width, height = self.size(img)
+        return FrontPage(title, url, self.name, width, height)
+
+    def parse(self, html, published: str | None = None) -> list[FrontPage]:
+        """Single pass over every <img>, keeping the images of the best-matching rule."""
+        if not html.strip(): return []
+        doc = lxml.html.fromstring(html)
+        candidates = []  # (matching rule indexes, page) in document order
+        for img in doc.iter("img"):
+            page = self.extract(img)
+            if page: candidates.append(({i for i, rule in enumerate(self.img_rules) if rule(img)}, page))
+        if not candidates: return []
+        best_rule = min(min(rules) for rules, _ in candidates)
+        pages, seen = [], set()
+        for rules, page in candidates:
+            # Avoid duplicates
+            if best_rule not in rules or page.url in seen: continue
+            seen.add(page.url)
+            page.published = published
+            pages.append(page)
+            if self.max_items and len(pages) >= self.max_items: break
+        return pages
+
+    def fetch(self, state: dict | None = None) -> tuple[list[FrontPage], str]:
+        """Returns (pages, CHANGED / NOT_MODIFIED / FAILED). With a `state` dict the request
+        is conditional, and a 304 returns the pages stored there by the last fetch."""
+        headers = dict(REQUEST_HEADERS)
+        stored = (state or {}).get(self.url, {})
+        if stored.get("etag"): headers['If-None-Match'] = stored["etag"]
+        if stored.get("last_modified"): headers['If-Modified-Since'] = stored["last_modified"]
+        try:
+            with instrumentation.span("scrape.fetch", source=self.name):
+                response = http_client.get(self.url, kind="page", headers=headers)
+            if response.status_code == 304:
+                return [FrontPage(**page) for page in stored.get("pages", [])], NOT_MODIFIED
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Error fetching {self.name} page: {e}")
+            return [], FAILED
+        last_modified = response.headers.get("Last-Modified")
+        try: published = parsedate_to_datetime(last_modified).astimezone(timezone.utc) if last_modified else None
+        except (TypeError, ValueError): published = None
+        with instrumentation.span("scrape.parse", source=self.name):
+            pages = self.parse(response.content, (published or datetime.now(timezone.utc)).isoformat())
+        if state is not None:
+            state[self.url] = {"etag": response.headers.get("ETag"), "last_modified": last_modified,
+                               "pages": [asdict(page) for page in pages]}
+        return pages, CHANGED
+
+
+class TomorrowsPapersSource(Source):
+    name = "tomorrowspapers"
+    url = "https://www.tomorrowspapers.co.uk/"
+    # The old selector cascade, most specific first.
+    img_rules = [
+        lambda img: 'front' in (img.get("src") or ""),  # img[src*='front']: images with 'front' in src
+        lambda img: 'front' in (img.get("alt") or ""),  # img[alt*='front']: images with 'front' in alt text
+        lambda img: 'newspaper' in (img.get("alt") or ""),  # img[alt*='newspaper']
+        lambda img: _has_ancestor(img, lambda el: 'front-page' in (el.get("class") or "").split()),  # .front-page img
+        lambda img: _has_ancestor(img, lambda el: el.tag == "article"),  # article img
+        lambda img: _has_ancestor(img, lambda el: el.tag == "main"),  # main img
+        lambda img: True,  # Fallback to all images
+    ]
+
+
+# Every known source by name, in priority order (earlier wins ties).
+SOURCES = {source.name: source for source in [TomorrowsPapersSource()]}
+ENABLED_SOURCES = [name.strip() for name in os.environ.get("SCRAPE_SOURCES", ",".join(SOURCES)).split(",") if name.strip()]
+
+
+def paper_identity(title: str) -> str:
+    """The paper and edition a title is for, as its normalised words ("The Mail on Sunday"
+    → "mail on sunday"). Not the newspaper_details id, which several titles share."""
+    return normalise_title(title) or title.lower()
+
+
+def merge(pages_by_source: list[list[FrontPage]]) -> list[FrontPage]:
+    """One source's pages per paper and edition (see paper_identity), in source-priority
+    then page order.
+
+    For each title, sources within FRESHNESS_TOLERANCE of the freshest one compete on
+    resolution, then priority; the winner contributes all its pages for that title.
+    Titles only one source has, such as regional and Sunday editions, are always kept.
+    Stale sources only fill gaps until they're STALE_AFTER older than the freshest page overall.
+    """
+    def published(page: FrontPage) -> datetime:
+        return datetime.fromisoformat(page.published) if page.published else datetime.min.replace(tzinfo=timezone.utc)
+
+    newest = max((published(page) for pages in pages_by_source for page in pages), default=None)
+    candidates = {}  # identity → {source index: [pages]}, in first-seen order
+    for index, pages in enumerate(pages_by_source):
+        for page in pages:
+            if newest - published(page) > STALE_AFTER: continue
+            candidates.setdefault(paper_identity(page.title), {}).setdefault(index, []).append(page)
+    merged = []
+    for by_source in candidates.values():
+        freshest = max(published(pages[0]) for pages in by_source.values())
+        fresh = [index for index, pages in by_source.items() if freshest - published(pages[0]) <= FRESHNESS_TOLERANCE]
+        best = max(fresh, key=lambda index: (max(page.pixels for page in by_source[index]), -index))
+        merged.extend(by_source[best])
+    return merged
+
+
+def fetch_all(state: dict | None = None, names: list[str] | None = None) -> list[FrontPage] | None:
+    """Fetches every enabled source at once and merges them; None if none of them changed
+    ([] if no known source is enabled). Raises SourcesUnavailable if every source failed."""
+    unknown = [name for name in (names or ENABLED_SOURCES) if name not in SOURCES]
+    if unknown: print(f"Ignoring unknown sources {unknown}; known: {list(SOURCES)}")
+    sources = [SOURCES[name] for name in (names or ENABLED_SOURCES) if name in SOURCES]
+    if not sources: return []
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        results = list(pool.map(lambda source: source.fetch(state), sources))
+    for source, (pages, status) in zip(sources, results):
+        instrumentation.count("scrape.source_pages", len(pages), source=source.name, status=status)
+    if all(status == FAILED for _, status in results):
+        raise SourcesUnavailable(f"no source could be fetched ({', '.join(source.name for source in sources)})")
+    if not any(status == CHANGED for _, status in results): return None
+    return merge([pages for pages, _ in results])
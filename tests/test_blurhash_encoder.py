@@ -0,0 +1,69 @@
+import random
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import blurhash_encoder
+
+blurhash = pytest.importorskip("blurhash")  # blurhash-python, the reference encoder
+
+
+def working_image(img: Image.Image) -> Image.Image:
+    """The thumbnail blurhash_encoder sums over, for the library to encode too."""
+    thumb = img.convert('RGB'); thumb.thumbnail((blurhash_encoder.WORKING_EDGE,) * 2, Image.BILINEAR, reducing_gap=2.0)
+    return thumb
+
+
+def random_image(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    size = (int(rng.integers(1, 200)), int(rng.integers(1, 200)))
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+
+def page_image(seed: int) -> Image.Image:
+    """A scan-sized JPEG with a masthead and photo blocks, decoded like a downloaded front page."""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (1000, 1600), (250, 248, 242))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 1000, 180), fill=tuple(rng.randrange(256) for _ in range(3)))
+    for top in range(240, 1500, 300):
+        draw.rectangle((30, top, rng.randrange(300, 970), top + 200), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buf = BytesIO(); img.save(buf, 'JPEG', quality=85)
+    return Image.open(BytesIO(buf.getvalue()))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_library_on_random_images(seed):
+    img = random_image(seed)
+    x_components, y_components = random.Random(seed).randint(1, 9), random.Random(-seed).randint(1, 9)
+    expected = blurhash.encode(working_image(img), x_components, y_components)
+    assert blurhash_encoder.encode(img, x_components, y_components) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_library_on_front_pages(seed):
+    with page_image(seed) as img:
+        expected = blurhash.encode(working_image(img), 4, 3)
+        assert blurhash_encoder.encode(img, 4, 3) == expected
+
+
+@pytest.mark.parametrize("mode", ['RGB', 'RGBA', 'L', 'P'])
+def test_output_decodes(mode):
+    img = random_image(7).convert(mode)
+    result = blurhash_encoder.encode(img)
+    assert blurhash.is_valid_blurhash(result)
+    decoded = blurhash.decode(result, 32, 32)  # The app's decoder must accept it.
+    assert np.asarray(decoded).shape[:2] == (32, 32)
+
+
+def test_leaves_image_open():
+    img = random_image(3)
+    blurhash_encoder.encode(img)
+    img.getpixel((0, 0))  # blurhash.encode would have closed it
+
+
+def test_rejects_bad_component_counts():
+    with pytest.raises(ValueError):
+        blurhash_encoder.encode(random_image(1), 0, 3)
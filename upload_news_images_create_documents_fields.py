@@ -3,52 +3,185 @@
 # ===================================================================================
 
 import os
-import requests
-import firebase_admin
-import blurhash
-from firebase_admin import credentials, firestore, storage
-from urllib.parse import quote
-from PIL import Image, ImageEnhance
-from io import BytesIO
-import google.generativeai as genai
 import traceback
 import re
 from datetime import datetime, timedelta, timezone
+from backends import Backends, google_backends
+from editions import build_editions, publish_editions
 import json # NEW: Import the JSON library for parsing
+import threading
+import time
+from functools import partial
+from gemini_cache import FirestoreCacheBackend, GeminiCache, SQLiteCacheBackend
+import http_client
+import instrumentation
+from image_processing import downscale_for_model, process_image_job
+from journal import FirestoreJournalBackend, RunJournal, SQLiteJournalBackend
+from manifest import ContentManifest
+from newspaper_titles import NewspaperDetailsIndex
+from ocr_index import DirectoryIndexStore, FirestoreIndexStore, OcrIndex
+from perceptual_index import PerceptualIndex, fingerprint
+from pipeline import Finished, Stage, StagePipeline
+from publisher import list_document_ids, prune_analysis_lookup, publish_analysis_lookup, publish_documents
+from rate_limit import get_limiter, limiter_for_model
+from scheduler import FULL, OCR_ONLY, DeadlineScheduler
 
 # === CONFIGURATION (UNCHANGED) ===
 SERVICE_ACCOUNT_PATH = "service-account.json"
 BUCKET_NAME = "frontpages-fireb.firebasestorage.app"
 COLLECTION_NAME = "frontpage_fixed"
 DETAILS_COLLECTION_NAME = "newspaper_details"
+MANIFEST_COLLECTION_NAME = "frontpage_manifest"
+MANIFEST_PATH = os.environ.get("FRONTPAGES_MANIFEST_PATH") # Set to keep the content manifest in a local JSON file instead of Firestore
+PHASH_INDEX_COLLECTION_NAME = "frontpage_phash"
+PHASH_INDEX_PATH = os.environ.get("FRONTPAGES_PHASH_INDEX_PATH") # Likewise for the near-duplicate index
+# Full-text index of the OCR articles: "files" (static JSON for the app), "firestore" or "off".
+OCR_INDEX_BACKEND = os.environ.get("OCR_INDEX_BACKEND", "files").lower()
+OCR_INDEX_DIR = "ocr_index"
+OCR_INDEX_COLLECTION_NAME = "ocr_index"
+ANALYSIS_LOOKUP_COLLECTION_NAME = "analysis_lookup" # Image URL hash → analysis, served by the describeimage function
+ANALYSIS_LOOKUP_TTL_SECONDS = float(os.environ.get("ANALYSIS_LOOKUP_TTL_DAYS", "30")) * 86400
+JOURNAL_COLLECTION_NAME = "run_journal"
+JOURNAL_PATH = os.environ.get("RUN_JOURNAL_PATH") # Set to keep the per-paper run journal in a local SQLite file instead of Firestore
 RSS_JSON_FEED_URL = "https://lak7474.github.io/frontpages-app-repo/frontpages.json"
+# Blob names carry a content hash, so a URL never changes meaning and can be cached for a year.
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
 
-# === INITIALIZATIONS (UNCHANGED) ===
-if not firebase_admin._apps:
-    cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-    firebase_admin.initialize_app(cred, {'storageBucket': BUCKET_NAME})
+# === PIPELINE CONFIGURATION (workers per stage, overridable from the environment) ===
+DOWNLOAD_WORKERS = int(os.environ.get("PIPELINE_DOWNLOAD_WORKERS", "4"))
+ANALYSIS_WORKERS = int(os.environ.get("PIPELINE_ANALYSIS_WORKERS", "4"))
+IMAGE_WORKERS = int(os.environ.get("PIPELINE_IMAGE_WORKERS", str(os.cpu_count() or 2)))
+UPLOAD_WORKERS = int(os.environ.get("PIPELINE_UPLOAD_WORKERS", "4"))
 
-db = firestore.client()
-bucket = storage.bucket()
-SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+# === GEMINI CACHE CONFIGURATION ===
+GEMINI_CACHE_ENABLED = os.environ.get("GEMINI_CACHE", "on").lower() not in ("off", "0", "false")
+GEMINI_CACHE_PATH = os.environ.get("GEMINI_CACHE_PATH") # Set to use a local SQLite file instead of the Firestore collection
+GEMINI_CACHE_COLLECTION_NAME = "gemini_cache"
+GEMINI_CACHE_TTL_SECONDS = float(os.environ.get("GEMINI_CACHE_TTL_DAYS", "7")) * 86400
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", "1000"))
 
-try:
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-    SEARCH_API_KEY = os.environ["GOOGLE_SEARCH_API_KEY"]
-    SEARCH_ENGINE_ID = os.environ["GOOGLE_SEARCH_ENGINE_ID"]
+# === GEMINI MODELS & PROMPTS (editing a prompt invalidates its cached results) ===
+ANALYSIS_MODEL_NAME = 'gemini-1.5-pro-latest'
+ANALYSIS_PROMPT = """Based on the attached newspaper front page, first identify the main, most prominent headline. Then, use the provided google_search tool to find the very latest news and context about that specific headline. Finally, write a solid analysis of the day's news, integrating the real-time information from your search. Start the entire response with "Today's insert newspaper title here front page...". Ensure the final output is a clean, narrative analysis and does not include any code, function calls, or tool outputs."""
+OCR_MODEL_NAME = 'gemini-1.5-flash-latest'
+# A much more advanced prompt instructing the AI to act as a document parser
+OCR_PROMPT = """Analyze the attached newspaper front page. Identify all text elements and classify them. Your output MUST be a single, valid JSON object and nothing else. Do not use markdown.
+
+The JSON object should have a key "articles" which is an array of text elements. Each element in the array should be an object with two keys: "type" and "text".
+
+The "type" can be one of the following strings: "headline", "subheading", "body_text", or "caption".
+
+Example Output:
+{
+  "articles": [
+    { "type": "headline", "text": "BIG NEWS SHAKES THE NATION" },
+    { "type": "subheading", "text": "Markets react to the shocking announcement from yesterday." },
+    { "type": "body_text", "text": "The full story begins here, with multiple paragraphs of text extracted from the main column of the newspaper..." },
+    { "type": "caption", "text": "A picture showing the event." }
+  ]
+}
+"""
+
+# === EXTRACTION MODE: one request per paper for both analysis and OCR ===
+# "separate" (the default) keeps the original two calls: the analysis is grounded with
+# google_search on the Pro model and OCR runs on Flash. "combined" sends one downscaled
+# image and asks GEMINI_EXTRACTION_MODEL for both in one JSON response, halving the
+# requests but dropping the search grounding and running OCR on that (by default Pro)
+# model. Combined falls back to separate on failure.
+GEMINI_EXTRACTION_MODE = os.environ.get("GEMINI_EXTRACTION_MODE", "separate").lower()
+EXTRACTION_MODEL_NAME = os.environ.get("GEMINI_EXTRACTION_MODEL", ANALYSIS_MODEL_NAME)
+MODEL_IMAGE_MAX_EDGE = int(os.environ.get("GEMINI_IMAGE_MAX_EDGE", "1600"))
+MODEL_IMAGE_QUALITY = int(os.environ.get("GEMINI_IMAGE_QUALITY", "80"))
+OCR_ARTICLE_TYPES = ["headline", "subheading", "body_text", "caption"]
+ANALYSIS_DEFERRED_TEXT = "AI analysis will be added in a later update."  # Shown while a paper waits for its full analysis
+ANALYSIS_FAILED_TEXT = "AI analysis could not be generated."
+EXTRACTION_PROMPT = """Analyze the attached newspaper front page and return a single JSON object with two keys.
+
+"analysis": a solid analysis of the day's news based on this front page, starting with the main, most prominent headline. Start it with "Today's insert newspaper title here front page...". It must be a clean narrative and must not include any code, function calls, or tool outputs.
+
+"articles": every text element on the page, in reading order, each as an object with a "type" ("headline", "subheading", "body_text" or "caption") and its "text".
+"""
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analysis": {"type": "string"},
+        "articles": {"type": "array", "items": {
+            "type": "object",
+            "properties": {"type": {"type": "string", "format": "enum", "enum": OCR_ARTICLE_TYPES}, "text": {"type": "string"}},
+            "required": ["type", "text"],
+        }},
+    },
+    "required": ["analysis", "articles"],
+}
+
+# === INITIALIZATIONS (lazy: nothing connects until a backend is first needed) ===
+_backends = None
+_backends_lock = threading.Lock()
+
+def connect_google_backends() -> Backends:
+    """Firebase Storage + Firestore + Gemini, checking the secrets first."""
+    missing = [name for name in ("GEMINI_API_KEY", "GOOGLE_SEARCH_API_KEY", "GOOGLE_SEARCH_ENGINE_ID") if name not in os.environ]
+    if missing:
+        print(f"❌ FATAL ERROR: A required secret is missing from the environment: {missing[0]!r}")
+        exit(1)
+    backends = google_backends(SERVICE_ACCOUNT_PATH, BUCKET_NAME, os.environ["GEMINI_API_KEY"])
     print("✨ All APIs configured successfully (Gemini & Google Search).")
-except KeyError as e:
-    print(f"❌ FATAL ERROR: A required secret is missing from the environment: {e}")
-    exit(1)
+    return backends
+
+def get_backends() -> Backends:
+    """The storage, document store and model client in use, connecting to Google on first use."""
+    global _backends
+    with _backends_lock:
+        if _backends is None: _backends = connect_google_backends()
+        return _backends
+
+def set_backends(backends: Backends):
+    """Swaps in other backends (e.g. local_backends.local_backends) for the rest of the process."""
+    global _backends, _gemini_cache
+    with _backends_lock: _backends = backends
+    with _gemini_cache_lock: _gemini_cache = None
+
+_gemini_cache = None
+_gemini_cache_lock = threading.Lock()
+_scheduler = None  # The running process_items' DeadlineScheduler, if any
+
+def get_gemini_cache() -> GeminiCache | None:
+    """Opens the Gemini result cache on first use (None when disabled)."""
+    global _gemini_cache
+    if not GEMINI_CACHE_ENABLED: return None
+    store = get_backends().store
+    with _gemini_cache_lock:
+        if _gemini_cache is None:
+            backend = SQLiteCacheBackend(GEMINI_CACHE_PATH) if GEMINI_CACHE_PATH else FirestoreCacheBackend(store, GEMINI_CACHE_COLLECTION_NAME)
+            _gemini_cache = GeminiCache(backend, GEMINI_CACHE_TTL_SECONDS, GEMINI_CACHE_MAX_ENTRIES)
+        return _gemini_cache
+
+def call_model(model_name: str, contents: list, timeout: float | None = None, **kwargs):
+    """One model request through its API's rate limiter, never timing out past the run deadline."""
+    if _scheduler: timeout = _scheduler.cap_timeout(timeout)
+    with limiter_for_model(model_name).slot():
+        return get_backends().model.generate(model_name, contents, timeout=timeout, **kwargs)
+
+def record_gemini_usage(model_name: str, response):
+    """Adds a Gemini response's token counts to the run's counters."""
+    instrumentation.count("gemini.requests", model=model_name)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None: return
+    instrumentation.count("gemini.prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0, model=model_name)
+    instrumentation.count("gemini.output_tokens", getattr(usage, "candidates_token_count", 0) or 0, model=model_name)
 
 # === HELPER FUNCTIONS (Analysis and Search are unchanged) ===
 def google_search(query: str) -> str:
     # (This function is correct and unchanged)
     print(f"    - 🔎 Performing real-time web search for: '{query}'")
     url = "https://www.googleapis.com/customsearch/v1"
-    params = {'q': query, 'key': SEARCH_API_KEY, 'cx': SEARCH_ENGINE_ID, 'num': 3}
+    params = {'q': query, 'key': os.environ.get("GOOGLE_SEARCH_API_KEY"), 'cx': os.environ.get("GOOGLE_SEARCH_ENGINE_ID"), 'num': 3}
     try:
-        response = requests.get(url, params=params)
+        instrumentation.count("search.requests")
+        with get_limiter("search").slot() as call:
+            response = http_client.get(url, kind="search", params=params)
+            call.throttled = response.status_code == 429
         response.raise_for_status()
         search_results = response.json()
         snippets = [item.get('snippet', '') for item in search_results.get('items', [])]
@@ -59,13 +192,19 @@ def google_search(query: str) -> str:
         return f"Web search failed with an error: {e}"
 
 def generate_ai_analysis(image_data: bytes) -> str:
-    # (This function is correct and unchanged)
+    """Gemini analysis of the front page, served from the cache when the same image was seen before."""
+    cache = get_gemini_cache()
+    cache_key = GeminiCache.key(image_data, ANALYSIS_PROMPT, ANALYSIS_MODEL_NAME) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None: print("   - 💾 Using cached Gemini analysis."); return cached
     try:
         print("   - 🧠 Calling Gemini 1.5 Pro for analysis...")
-        model = genai.GenerativeModel(model_name='gemini-1.5-pro-latest', tools=[google_search])
+        model = get_backends().model
         image_part = {"mime_type": "image/jpeg", "data": image_data}
-        prompt = """Based on the attached newspaper front page, first identify the main, most prominent headline. Then, use the provided google_search tool to find the very latest news and context about that specific headline. Finally, write a solid analysis of the day's news, integrating the real-time information from your search. Start the entire response with "Today's insert newspaper title here front page...". Ensure the final output is a clean, narrative analysis and does not include any code, function calls, or tool outputs."""
-        response = model.generate_content([prompt, image_part], request_options={"timeout": 120})
+        prompt = ANALYSIS_PROMPT
+        with instrumentation.span("gemini.analysis"):
+            response = call_model(ANALYSIS_MODEL_NAME, [prompt, image_part], tools=[google_search], timeout=120)
+        record_gemini_usage(ANALYSIS_MODEL_NAME, response)
         raw_text = ""
         candidate = response.candidates[0]
         if candidate.content.parts and candidate.content.parts[0].function_call:
@@ -74,7 +213,9 @@ def generate_ai_analysis(image_data: bytes) -> str:
             query = function_call.args['query']
             search_results_text = google_search(query=query)
             print("    -  Feeding search results back to the model...")
-            final_response = model.generate_content([prompt, image_part, genai.protos.Part(function_response=genai.protos.FunctionResponse(name='google_search', response={'result': search_results_text}))])
+            with instrumentation.span("gemini.analysis"):
+                final_response = call_model(ANALYSIS_MODEL_NAME, [prompt, image_part, model.function_response('google_search', {'result': search_results_text})], tools=[google_search], timeout=120)
+            record_gemini_usage(ANALYSIS_MODEL_NAME, final_response)
             raw_text = final_response.text
             print("     - Context-aware analysis generated.")
         else:
@@ -82,38 +223,27 @@ def generate_ai_analysis(image_data: bytes) -> str:
             print("     - Analysis generated without web search.")
         cleanup_regex = r"```tool_outputs.*?```"
         cleaned_text = re.sub(cleanup_regex, "", raw_text, flags=re.DOTALL).strip()
+        if cache: cache.set(cache_key, cleaned_text)
         return cleaned_text
     except Exception as e:
         print(f"     - ❌ FATAL ERROR during analysis: {e}")
         traceback.print_exc()
-        return "AI analysis could not be generated."
+        return ANALYSIS_FAILED_TEXT
 
 # === REWRITTEN HELPER FUNCTION FOR STRUCTURED OCR === ### MODIFIED ###
 def generate_ocr_text(image_data: bytes) -> dict: # Return type is now dict
     """Performs structured OCR on an image and returns a JSON object (as a dict)."""
+    cache = get_gemini_cache()
+    cache_key = GeminiCache.key(image_data, OCR_PROMPT, OCR_MODEL_NAME) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None: print("   - 💾 Using cached structured OCR."); return cached
     try:
         print("   - 📄 Calling Gemini 1.5 Flash for Structured OCR...")
-        model = genai.GenerativeModel(model_name='gemini-1.5-flash-latest')
         image_part = {"mime_type": "image/jpeg", "data": image_data}
-        
-        # A much more advanced prompt instructing the AI to act as a document parser
-        prompt = """Analyze the attached newspaper front page. Identify all text elements and classify them. Your output MUST be a single, valid JSON object and nothing else. Do not use markdown.
-
-The JSON object should have a key "articles" which is an array of text elements. Each element in the array should be an object with two keys: "type" and "text".
-
-The "type" can be one of the following strings: "headline", "subheading", "body_text", or "caption".
-
-Example Output:
-{
-  "articles": [
-    { "type": "headline", "text": "BIG NEWS SHAKES THE NATION" },
-    { "type": "subheading", "text": "Markets react to the shocking announcement from yesterday." },
-    { "type": "body_text", "text": "The full story begins here, with multiple paragraphs of text extracted from the main column of the newspaper..." },
-    { "type": "caption", "text": "A picture showing the event." }
-  ]
-}
-"""
-        response = model.generate_content([prompt, image_part], request_options={"timeout": 100})
+        prompt = OCR_PROMPT
+        with instrumentation.span("gemini.ocr"):
+            response = call_model(OCR_MODEL_NAME, [prompt, image_part], timeout=100)
+        record_gemini_usage(OCR_MODEL_NAME, response)
         
         # Parse the JSON string from the AI into a Python dictionary
         try:
@@ -121,6 +251,7 @@ Example Output:
             cleaned_response = response.text.replace("```json", "").replace("```", "").strip()
             json_output = json.loads(cleaned_response)
             print("     - Structured OCR JSON parsed successfully.")
+            if cache: cache.set(cache_key, json_output)
             return json_output
         except json.JSONDecodeError as e:
             print(f"     - ❌ ERROR parsing JSON from AI: {e}")
@@ -132,125 +263,478 @@ Example Output:
         return {"error": "Text could not be extracted from this image."}
 
 
+def extraction_failed(analysis_text: str | None, ocr_data) -> bool:
+    """Whether a paper's analysis or OCR is a failure/deferred placeholder that a later run should redo."""
+    return analysis_text in (None, ANALYSIS_DEFERRED_TEXT, ANALYSIS_FAILED_TEXT) or not isinstance(ocr_data, dict) or 'error' in ocr_data
+
+def validate_extraction(data) -> tuple[str, dict]:
+    """Checks a combined-mode response and splits it into (analysis text, OCR dict)."""
+    if not isinstance(data, dict): raise ValueError("response is not a JSON object")
+    analysis = data.get("analysis")
+    if not isinstance(analysis, str) or not analysis.strip(): raise ValueError("missing 'analysis' text")
+    articles = data.get("articles")
+    if not isinstance(articles, list): raise ValueError("missing 'articles' array")
+    for article in articles:
+        if not isinstance(article, dict) or article.get("type") not in OCR_ARTICLE_TYPES or not isinstance(article.get("text"), str):
+            raise ValueError(f"invalid article entry: {article!r}")
+    return analysis.strip(), {"articles": articles}
+
+def extraction_cache_key(image_data: bytes) -> str:
+    # The downscale settings change what the model sees, so they're part of the key.
+    model_key = f"{EXTRACTION_MODEL_NAME}@{MODEL_IMAGE_MAX_EDGE}q{MODEL_IMAGE_QUALITY}"
+    return GeminiCache.key(image_data, EXTRACTION_PROMPT, model_key)
+
+def cached_results(image_data: bytes) -> tuple[str | None, dict | None]:
+    """Whatever the Gemini cache already has for this image, as (analysis, OCR), without calling the model."""
+    cache = get_gemini_cache()
+    if not cache: return None, None
+    extraction = cache.get(extraction_cache_key(image_data))
+    if extraction is not None:
+        try: return validate_extraction(extraction)
+        except ValueError: pass
+    return (cache.get(GeminiCache.key(image_data, ANALYSIS_PROMPT, ANALYSIS_MODEL_NAME)),
+            cache.get(GeminiCache.key(image_data, OCR_PROMPT, OCR_MODEL_NAME)))
+
+def generate_extraction(image_data: bytes) -> tuple[str, dict] | None:
+    """Gets analysis and structured OCR from one Gemini call on a downscaled copy of the scan.
+
+    Returns None when the call or its validation fails, so the caller can fall back.
+    """
+    cache = get_gemini_cache()
+    cache_key = extraction_cache_key(image_data) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None: print("   - 💾 Using cached Gemini extraction."); return validate_extraction(cached)
+    try:
+        with instrumentation.span("image.downscale_for_model"):
+            model_img_data = downscale_for_model(image_data, MODEL_IMAGE_MAX_EDGE, MODEL_IMAGE_QUALITY)
+        instrumentation.count("gemini.image_bytes", len(model_img_data), model=EXTRACTION_MODEL_NAME)
+        print(f"   - 🧠 Calling Gemini for combined analysis + OCR ({len(model_img_data)} of {len(image_data)} bytes)...")
+        generation_config = {"response_mime_type": "application/json", "response_schema": EXTRACTION_SCHEMA}
+        image_part = {"mime_type": "image/jpeg", "data": model_img_data}
+        with instrumentation.span("gemini.extraction"):
+            response = call_model(EXTRACTION_MODEL_NAME, [EXTRACTION_PROMPT, image_part], generation_config=generation_config, timeout=120)
+        record_gemini_usage(EXTRACTION_MODEL_NAME, response)
+        data = json.loads(response.text)
+        result = validate_extraction(data)
+        print("     - Combined analysis + structured OCR validated.")
+        if cache: cache.set(cache_key, data)
+        return result
+    except Exception as e:
+        print(f"     - ❌ ERROR during combined extraction: {e}")
+        return None
+
 # === Other functions are unchanged except for where they save the data ===
 
-def calculate_paper_date(pub_date_str: str) -> str | None:
-    # (This function is correct and unchanged)
+def _paper_datetime(pub_date_str: str) -> datetime | None:
+    """The date the paper is for: items published from 20:00 UTC are the next day's papers."""
     if not pub_date_str: return None
     try:
         parsed_date = datetime.strptime(pub_date_str, "%Y-%m-%d %H:%M:%S")
         parsed_date = parsed_date.replace(tzinfo=timezone.utc)
         if parsed_date.hour >= 20: paper_date = parsed_date + timedelta(days=1)
         else: paper_date = parsed_date
-        return paper_date.strftime("%A %d %B %Y")
+        return paper_date
     except (ValueError, TypeError):
         print(f"   - ⚠️ Could not parse date: {pub_date_str}"); return None
 
-def get_newspaper_details(title: str) -> dict:
-    # (This function is correct and unchanged)
-    lower_title = title.lower()
-    title_map = {"sun": "sun", "mail": "mail", "metro": "metro", "mirror": "mirror", "times": "times", "telegraph": "telegraph", "express": "express", "star": "star", "i": "i", "guardian": "guardian", "observer": "observer", "financial": "financial", "ft": "financial", "independent": "independent"}
-    doc_id = None
-    for keyword, id in title_map.items():
-        if keyword in lower_title: doc_id = id; break
-    if not doc_id: print(f"   - ⚠️ No newspaper details found for title: {title}"); return {}
+def calculate_paper_date(pub_date_str: str) -> str | None:
+    paper_date = _paper_datetime(pub_date_str)
+    return paper_date.strftime("%A %d %B %Y") if paper_date else None
+
+def calculate_paper_iso_date(pub_date_str: str) -> str | None:
+    """Same date as calculate_paper_date, as YYYY-MM-DD (the editions/{date} key)."""
+    paper_date = _paper_datetime(pub_date_str)
+    return paper_date.strftime("%Y-%m-%d") if paper_date else None
+
+_details_index = None
+
+def load_newspaper_details() -> NewspaperDetailsIndex:
+    """Reads the whole newspaper_details collection once; later lookups cost no network calls."""
+    global _details_index
     try:
-        doc_ref = db.collection("newspaper_details").document(doc_id)
-        doc = doc_ref.get()
-        if doc.exists: print(f"   - 📖 Found details for '{doc_id}' in Firestore."); return doc.to_dict()
-        else: print(f"   - ⚠️ Document '{doc_id}' not found."); return {}
-    except Exception as e: print(f"   - ❌ ERROR fetching details for '{doc_id}': {e}"); return {}
+        _details_index = NewspaperDetailsIndex.load(get_backends().store, DETAILS_COLLECTION_NAME)
+        print(f"📖 Loaded details for {len(_details_index.details_by_id)} newspapers.")
+    except Exception as e:
+        print(f" ❌ ERROR loading {DETAILS_COLLECTION_NAME}: {e}"); _details_index = NewspaperDetailsIndex({})
+    return _details_index
 
-def delete_all_documents():
-    # (This function is correct and unchanged)
-    collection_ref = db.collection(COLLECTION_NAME)
-    docs = collection_ref.stream()
-    deleted_count = 0
-    batch = db.batch()
-    for doc in docs:
-        batch.delete(doc.reference)
-        deleted_count += 1
-        if deleted_count % 500 == 0: batch.commit(); batch = db.batch()
-    if deleted_count % 500 > 0: batch.commit()
-    if deleted_count > 0: print(f"🧹 All {deleted_count} documents successfully deleted from {COLLECTION_NAME}")
-    else: print(f"🧹 Collection {COLLECTION_NAME} is already empty.")
+def get_newspaper_details(title: str) -> dict:
+    index = _details_index or load_newspaper_details()
+    return index.lookup(title)
 
 def fetch_feed():
     # (This function is correct and unchanged)
-    resp = requests.get(RSS_JSON_FEED_URL)
+    resp = http_client.get(RSS_JSON_FEED_URL, kind="feed")
     resp.raise_for_status()
     return resp.json().get('items', [])
 
-def process_items(items):
-    for item in items:
-        # --- STAGE 1 ---
-        image_src = item.get('link')
-        pub_date_str = item.get('pubDate')
-        title = item.get('title', '')
-        if not image_src or not title: print(" ▶️  Skipped item with no link or title"); continue
-        details = get_newspaper_details(title)
-        paper_date_str_formatted = calculate_paper_date(pub_date_str)
-        original_filename = os.path.basename(image_src)
-        try:
-            r = requests.get(image_src, stream=True); r.raise_for_status(); original_img_data = r.content
-        except Exception as e: print(f" ❌ Download failed for {original_filename}: {e}"); continue
-        # --- STAGE 1.5 ---
-        analysis_text = generate_ai_analysis(original_img_data)
-        ocr_data = generate_ocr_text(original_img_data) # Variable name changed to reflect it holds a dictionary
-        # --- STAGE 2 & 3 ---
-        try:
-            print(f"   - Performing Pillow operations for {original_filename}...")
-            with Image.open(BytesIO(original_img_data)) as img:
-                img_rgb = img.convert('RGB'); enhancer = ImageEnhance.Brightness(img_rgb); light_img_obj = enhancer.enhance(0.9)
-                light_width, light_height = light_img_obj.size; light_aspect_ratio = light_height / light_width if light_width else None
-                light_buffer = BytesIO(); light_img_obj.save(light_buffer, format='JPEG'); final_light_img_data = light_buffer.getvalue()
-            with Image.open(BytesIO(original_img_data)) as img:
-                img_rgb = img.convert('RGB'); enhancer = ImageEnhance.Brightness(img_rgb); dark_img_obj = enhancer.enhance(0.80)
-                dark_width, dark_height = dark_img_obj.size; dark_aspect_ratio = dark_height / dark_width if dark_width else None
-                dark_buffer = BytesIO(); dark_img_obj.save(dark_buffer, format='JPEG'); final_dark_img_data = dark_buffer.getvalue()
-            print("     - Pillow operations complete.")
-        except Exception as e: print(f" ❌ Failed during PILLOW processing for {original_filename}: {e}"); continue
-        try:
-            print(f"   - Performing Blurhash operations for {original_filename}...")
-            with Image.open(BytesIO(original_img_data)) as img: blurhash_light = blurhash.encode(img, x_components=4, y_components=3)
-            with Image.open(BytesIO(final_dark_img_data)) as img: blurhash_dark = blurhash.encode(img, x_components=4, y_components=3)
-            print("     - Blurhash operations complete.")
-        except Exception as e: print(f" ❌ Failed during BLURHASH processing for {original_filename}: {e}"); continue
-        # --- STAGE 4 --- ### MODIFIED ###
-        base_doc_data = {
-            'title': title, 'pubDate': pub_date_str, 'dateOfPaper': paper_date_str_formatted,
-            'analysis': analysis_text, 'ocr_text': ocr_data, # This now saves the entire JSON object
-            'fetched': SERVER_TIMESTAMP, 'ownedBy1': details.get('ownedBy1'), 'ownedBy2': details.get('ownedBy2'), 'ownedBy3': details.get('ownedBy3'),
-            'format': details.get('format'), 'style': details.get('style'), 'leaning': details.get('leaning'),
-            'readershipDemographics': details.get('readershipDemographics'),
-        }
-        # Light Version
-        try:
-            light_filename = f"light-{original_filename}"; light_doc_id = f"light-{os.path.splitext(original_filename)[0]}"
-            blob_path_light = f"images/{light_filename}"; bucket.blob(blob_path_light).upload_from_string(final_light_img_data, content_type='image/jpeg')
-            public_url_light = f"https://firebasestorage.googleapis.com/v0/b/{BUCKET_NAME}/o/{quote(blob_path_light, safe='')}?alt=media"
-            light_doc = base_doc_data.copy()
-            light_doc.update({'image': public_url_light, 'width': light_width, 'height': light_height, 'aspect': light_aspect_ratio, 'blurhash': blurhash_light, 'brightness': 'light'})
-            db.collection(COLLECTION_NAME).document(light_doc_id).set(light_doc)
-            print(f" ✅ Uploaded & saved (light): {light_doc_id}")
-        except Exception as e: print(f" ❌ Failed to WRITE light version for {original_filename}: {e}")
-        # Dark Version
+def load_feed_file(path: str) -> list:
+    """Reads the items of a local frontpages.json (e.g. the one generate.py just wrote)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get('items', [])
+
+def load_manifest() -> ContentManifest:
+    """Loads the content-hash manifest of the previous run (empty if there isn't one)."""
+    try:
+        if MANIFEST_PATH: return ContentManifest.load_json(MANIFEST_PATH)
+        return ContentManifest.load_firestore(get_backends().store, MANIFEST_COLLECTION_NAME)
+    except Exception as e:
+        print(f"   - ⚠️ Could not load content manifest, every paper will be processed: {e}"); return ContentManifest()
+
+def load_phash_index() -> PerceptualIndex:
+    """The near-duplicate index of earlier runs (dates are read from Firestore as they come up)."""
+    try:
+        if PHASH_INDEX_PATH: return PerceptualIndex.load_json(PHASH_INDEX_PATH)
+        return PerceptualIndex.for_firestore(get_backends().store, PHASH_INDEX_COLLECTION_NAME)
+    except Exception as e:
+        print(f"   - ⚠️ Could not load near-duplicate index, starting an empty one: {e}"); return PerceptualIndex()
+
+def save_phash_index(index: PerceptualIndex, keep_dates):
+    try:
+        if PHASH_INDEX_PATH: index.save_json(PHASH_INDEX_PATH, keep_dates)
+        else: index.save_firestore(get_backends().store, PHASH_INDEX_COLLECTION_NAME)
+        print(f"🖼️  Near-duplicate index saved ({', '.join(sorted(index.updated_dates)) or 'no new pages'}).")
+    except Exception as e: print(f" ❌ Failed to save near-duplicate index: {e}")
+
+def open_ocr_index(directory: str | None = None) -> OcrIndex | None:
+    """The OCR full-text index (None when OCR_INDEX_BACKEND is "off" or it can't be read)."""
+    if OCR_INDEX_BACKEND == "off": return None
+    try:
+        if OCR_INDEX_BACKEND == "firestore": return OcrIndex(FirestoreIndexStore(get_backends().store, OCR_INDEX_COLLECTION_NAME))
+        return OcrIndex(DirectoryIndexStore(directory or OCR_INDEX_DIR))
+    except Exception as e:
+        print(f"   - ⚠️ Could not open the OCR index, it won't be updated this run: {e}"); return None
+
+def index_ocr(ocr_index: OcrIndex, result: dict):
+    """Adds one processed paper's OCR articles to the full-text index."""
+    articles = (result.get('ocr_data') or {}).get('articles')
+    if not articles or not result.get('documents') or not result.get('paper_date_iso'): return
+    stem = os.path.splitext(result['original_filename'])[0]
+    doc_id = f"light-{stem}" if f"light-{stem}" in result['documents'] else next(iter(result['documents']))
+    srcset = result['documents'][doc_id]['srcset'].get('jpeg', {})
+    image = (srcset.get('thumb') or {}).get('url') or result['documents'][doc_id]['image']
+    ocr_index.add(f"{result['paper_date_iso']}/{stem}", articles, result['title'], result['paper_date_iso'], doc=doc_id, image=image)
+
+def save_ocr_index(ocr_index: OcrIndex):
+    try:
+        expired = ocr_index.prune()
+        written = ocr_index.save()
+        print(f"🔎 OCR index saved: {len(ocr_index.papers)} papers, {written} shards rewritten, {expired} expired.")
+    except Exception as e: print(f" ❌ Failed to save the OCR index: {e}")
+
+def open_journal(resume: bool = False) -> RunJournal | None:
+    """The per-paper run journal; with `resume`, what an interrupted run got done is reused."""
+    try:
+        backend = SQLiteJournalBackend(JOURNAL_PATH) if JOURNAL_PATH else FirestoreJournalBackend(get_backends().store, JOURNAL_COLLECTION_NAME)
+        journal = RunJournal(backend, resume=resume)
+    except Exception as e:
+        print(f"   - ⚠️ Could not open the run journal, this run can't be resumed: {e}"); return None
+    if resume:
+        stages = ", ".join(f"{count} {stage}" for stage, count in journal.summary().items())
+        print(f"↪️  Resuming: {len(journal.entries)} papers in the journal{f' ({stages})' if stages else ''}.")
+    return journal
+
+def save_manifest(manifest: ContentManifest):
+    try:
+        if MANIFEST_PATH: manifest.save_json(MANIFEST_PATH)
+        else: manifest.save_firestore(get_backends().store, MANIFEST_COLLECTION_NAME)
+        print(f"🗂️  Content manifest saved ({len(manifest.entries)} entries).")
+    except Exception as e: print(f" ❌ Failed to save content manifest: {e}")
+
+# === STAGE FUNCTIONS (run by the pipeline in process_items) ===
+def download_item(item: dict, manifest: ContentManifest | None = None, existing_doc_ids: set | None = None,
+                  scheduler: DeadlineScheduler | None = None, phash_index: PerceptualIndex | None = None,
+                  journal: RunJournal | None = None) -> dict | Finished | None:
+    """Stage 1: downloads the original scan and resolves the paper's metadata.
+
+    Papers whose bytes match the manifest end here, keeping their existing docs, as do
+    near-duplicates of another URL's page in the perceptual index (reusing an earlier
+    run's docs, or dropped as a copy of a page this run is already processing) and
+    placeholders. A URL whose bytes changed is always processed as a new edition.
+    Papers the journal has as uploaded end here too; analysed ones skip the analysis.
+    """
+    job = _download_item(item, manifest, existing_doc_ids, phash_index, journal)
+    if scheduler and not isinstance(job, dict): scheduler.skip()  # It won't reach the analysis stage
+    return job
+
+def _download_item(item: dict, manifest: ContentManifest | None, existing_doc_ids: set | None,
+                   phash_index: PerceptualIndex | None, journal: RunJournal | None) -> dict | Finished | None:
+    image_src = item.get('link')
+    pub_date_str = item.get('pubDate')
+    title = item.get('title', '')
+    if not image_src or not title: print(" ▶️  Skipped item with no link or title"); return None
+    original_filename = os.path.basename(image_src)
+    try:
+        r = http_client.get(image_src, kind="image"); r.raise_for_status(); original_img_data = r.content
+    except Exception as e: print(f" ❌ Download failed for {original_filename}: {e}"); return None
+    print(f"   - ⬇️  Downloaded {original_filename} ({len(original_img_data)} bytes)")
+    sha256 = ContentManifest.digest(original_img_data)
+    dates = {'pub_date_str': pub_date_str, 'paper_date_iso': calculate_paper_iso_date(pub_date_str),
+             'paper_date_str_formatted': calculate_paper_date(pub_date_str)}
+    kept_doc_ids = manifest.unchanged(image_src, sha256, existing_doc_ids) if manifest else None
+    if kept_doc_ids:
+        print(f" ⏭️  Unchanged since last run, skipping: {original_filename}")
+        return Finished({'image_src': image_src, 'sha256': sha256, 'doc_ids': kept_doc_ids, 'unchanged': True, **dates})
+    try:
+        with instrumentation.span("image.fingerprint"): dhash, thumb, placeholder = fingerprint(original_img_data)
+    except Exception as e: print(f" ❌ Not a readable image: {original_filename}: {e}"); return None
+    if placeholder:
+        print(f" ⏭️  Placeholder image, skipping: {original_filename}")
+        return Finished({'image_src': image_src, 'sha256': sha256, 'doc_ids': [], 'skipped': 'placeholder'})
+    paper_date_iso = dates['paper_date_iso']
+    # A URL whose bytes changed since the last run is a new edition, however alike it looks.
+    updated = manifest is not None and manifest.changed(image_src, sha256)
+    duplicate_of = phash_index.claim(paper_date_iso or 'undated', dhash, thumb, image_src, existing_doc_ids, match=not updated) if phash_index else None
+    if duplicate_of and duplicate_of.get('doc_ids'):
+        print(f" ⏭️  Same page as last run's {os.path.basename(duplicate_of['url'])}, reusing its docs: {original_filename}")
+        return Finished({'image_src': image_src, 'sha256': sha256, 'doc_ids': list(duplicate_of['doc_ids']), 'unchanged': True, 'near_duplicate': True, **dates})
+    if duplicate_of:
+        print(f" ⏭️  Same page as {os.path.basename(duplicate_of['url'])}, skipping: {original_filename}")
+        return Finished({'image_src': image_src, 'sha256': sha256, 'doc_ids': [], 'skipped': 'duplicate'})
+    resumed = journal.get(image_src, sha256) if journal else None
+    if (resumed and 'uploaded' in resumed['stages'] and resumed['complete']
+            and not extraction_failed(resumed.get('analysis_text'), resumed.get('ocr_data'))):
+        print(f" ↪️  Already uploaded before the last run stopped, publishing as is: {original_filename}")
+        documents = {doc_id: {**doc, 'fetched': get_backends().store.SERVER_TIMESTAMP} for doc_id, doc in resumed['documents'].items()}
+        return Finished({
+            'title': resumed['title'], 'paper_date_iso': resumed['paper_date_iso'], 'original_filename': original_filename,
+            'image_src': image_src, 'sha256': sha256, 'dhash': dhash, 'thumb': thumb, 'analysis_text': resumed.get('analysis_text'), 'ocr_data': resumed['ocr_data'],
+            'analysis_mode': resumed['analysis_mode'], 'complete': resumed['complete'], 'documents': documents, 'doc_ids': list(documents),
+        })
+    details = get_newspaper_details(title)
+    job = {
+        'title': title, **dates,
+        'details': details, 'original_filename': original_filename, 'original_img_data': original_img_data,
+        'image_src': image_src, 'sha256': sha256, 'dhash': dhash, 'thumb': thumb,
+    }
+    if resumed and 'analysed' in resumed['stages']:
+        print(f" ↪️  Already analysed before the last run stopped: {original_filename}")
+        job.update({'analysis_text': resumed['analysis_text'], 'ocr_data': resumed['ocr_data'], 'analysis_mode': resumed['analysis_mode'], 'resumed': True})
+    elif journal: journal.mark(image_src, sha256, 'downloaded')
+    return job
+
+def analyse_item(job: dict, scheduler: DeadlineScheduler | None = None, journal: RunJournal | None = None) -> dict:
+    """Stage 1.5: Gemini analysis and structured OCR, scaled down when the run deadline is close."""
+    if job.get('resumed'):
+        if scheduler: scheduler.skip()
+        return job
+    mode = scheduler.begin_analysis() if scheduler else FULL
+    job['analysis_mode'] = mode
+    start = time.monotonic()
+    try: _analyse(job, mode)
+    finally:
+        if scheduler: scheduler.finish_analysis(mode, time.monotonic() - start)
+    # A failed call isn't journaled as analysed, so a resumed run tries it again.
+    if journal and not extraction_failed(job['analysis_text'], job['ocr_data']):
+        journal.mark(job['image_src'], job['sha256'], 'analysed', analysis_text=job['analysis_text'], ocr_data=job['ocr_data'], analysis_mode=mode)
+    return job
+
+def _analyse(job: dict, mode: str):
+    if mode != FULL:
+        print(f"   - ⏳ Deadline close, {mode.replace('_', ' ')} analysis for {job['original_filename']}")
+        cached_analysis, cached_ocr = cached_results(job['original_img_data'])
+        job['analysis_text'] = cached_analysis or ANALYSIS_DEFERRED_TEXT
+        if mode == OCR_ONLY: job['ocr_data'] = cached_ocr or generate_ocr_text(job['original_img_data'])
+        else: job['ocr_data'] = cached_ocr or {"error": "Text extraction was deferred to a later run."}
+        return
+    if GEMINI_EXTRACTION_MODE == "combined":
+        extraction = generate_extraction(job['original_img_data'])
+        if extraction:
+            job['analysis_text'], job['ocr_data'] = extraction
+            return
+        print(f"   - ↩️  Falling back to separate analysis and OCR calls for {job['original_filename']}")
+    job['analysis_text'] = generate_ai_analysis(job['original_img_data'])
+    job['ocr_data'] = generate_ocr_text(job['original_img_data']) # Variable name changed to reflect it holds a dictionary
+
+def upload_rendition(blob_path: str, rendition: dict) -> str:
+    """Uploads one encoded image with long-lived caching and returns its public URL."""
+    with instrumentation.span("storage.upload", format=rendition['format']):
+        url = get_backends().storage.upload(blob_path, rendition['data'], rendition['content_type'], IMAGE_CACHE_CONTROL)
+    instrumentation.count("storage.bytes", len(rendition['data']), format=rendition['format'])
+    return url
+
+def upload_item(job: dict, journal: RunJournal | None = None) -> dict:
+    """Stage 4: uploads every rendition of the light/dark images and builds one Firestore doc for each.
+
+    Each doc gets a `srcset` map (format → size → url/bytes/width/height); `image`
+    stays the full-size JPEG for existing clients. The docs are only written by the
+    publish step at the end of process_items.
+    """
+    if journal: journal.mark(job['image_src'], job['sha256'], 'encoded')  # The encoded images themselves aren't kept
+    original_filename = job['original_filename']
+    details = job['details']
+    base_doc_data = {
+        'title': job['title'], 'pubDate': job['pub_date_str'], 'dateOfPaper': job['paper_date_str_formatted'], 'paperDate': job['paper_date_iso'],
+        'analysis': job['analysis_text'], 'ocr_text': job['ocr_data'], # This now saves the entire JSON object
+        'fetched': get_backends().store.SERVER_TIMESTAMP, 'ownedBy1': details.get('ownedBy1'), 'ownedBy2': details.get('ownedBy2'), 'ownedBy3': details.get('ownedBy3'),
+        'format': details.get('format'), 'style': details.get('style'), 'leaning': details.get('leaning'),
+        'readershipDemographics': details.get('readershipDemographics'),
+    }
+    job['documents'] = {}
+    for brightness, variant in job['variants'].items():
         try:
-            dark_filename = f"dark-{original_filename}"; dark_doc_id = f"dark-{os.path.splitext(original_filename)[0]}"
-            blob_path_dark = f"images/{dark_filename}"; bucket.blob(blob_path_dark).upload_from_string(final_dark_img_data, content_type='image/jpeg')
-            public_url_dark = f"https://firebasestorage.googleapis.com/v0/b/{BUCKET_NAME}/o/{quote(blob_path_dark, safe='')}?alt=media"
-            dark_doc = base_doc_data.copy()
-            dark_doc.update({'image': public_url_dark, 'width': dark_width, 'height': dark_height, 'aspect': dark_aspect_ratio, 'blurhash': blurhash_dark, 'brightness': 'dark'})
-            db.collection(COLLECTION_NAME).document(dark_doc_id).set(dark_doc)
-            print(f" ✅ Uploaded & saved (dark): {dark_doc_id}")
-        except Exception as e: print(f" ❌ Failed to WRITE dark version for {original_filename}: {e}")
+            stem = os.path.splitext(original_filename)[0]; doc_id = f"{brightness}-{stem}"
+            srcset, uploaded_urls = {}, {}
+            for rendition in variant['renditions']:
+                # Small scans produce identical renditions for several sizes; those share one blob.
+                if rendition['sha256'] not in uploaded_urls:
+                    blob_path = f"images/{brightness}/{stem}-{rendition['sha256'][:16]}.{IMAGE_EXTENSIONS[rendition['format']]}"
+                    uploaded_urls[rendition['sha256']] = upload_rendition(blob_path, rendition)
+                srcset.setdefault(rendition['format'], {})[rendition['size']] = {
+                    'url': uploaded_urls[rendition['sha256']], 'bytes': len(rendition['data']),
+                    'width': rendition['width'], 'height': rendition['height'],
+                }
+            largest_jpeg = max(srcset['jpeg'].values(), key=lambda entry: entry['width'])
+            doc = base_doc_data.copy()
+            doc.update({'image': largest_jpeg['url'], 'srcset': srcset, 'width': variant['width'], 'height': variant['height'], 'aspect': variant['aspect'], 'blurhash': variant['blurhash'], 'brightness': brightness})
+            job['documents'][doc_id] = doc
+            print(f" ✅ Uploaded ({brightness}): {doc_id}")
+        except Exception as e: print(f" ❌ Failed to UPLOAD {brightness} version for {original_filename}: {e}")
+    job['doc_ids'] = list(job['documents'])
+    job['complete'] = len(job['doc_ids']) == len(job['variants'])
+    if journal and job['documents']:
+        journal.mark(job['image_src'], job['sha256'], 'uploaded', title=job['title'], paper_date_iso=job['paper_date_iso'],
+                     complete=job['complete'], documents={doc_id: {key: value for key, value in doc.items() if key != 'fetched'}
+                                                          for doc_id, doc in job['documents'].items()})
+    return job
+
+def publish_edition_manifests(desired: dict[str, dict], kept: dict[str, dict], dates: set[str]):
+    """Writes the compact editions/{date} manifest for tonight's papers, kept ones included.
+
+    `kept` maps each reused doc id to its download result, whose dates are tonight's:
+    the doc itself still carries the night it was first published. Only `dates`, the
+    paper dates in tonight's feed, are written, so earlier editions stay as they were.
+    """
+    db = get_backends().store
+    try:
+        kept_refs = [db.collection(COLLECTION_NAME).document(doc_id) for doc_id in sorted(kept)]
+        kept_docs = {snapshot.id: snapshot.to_dict() for snapshot in db.get_all(kept_refs) if snapshot.exists} if kept_refs else {}
+        for doc_id, doc in kept_docs.items():
+            result = kept[doc_id]
+            doc.update({'pubDate': result['pub_date_str'], 'paperDate': result['paper_date_iso'],
+                        'dateOfPaper': result['paper_date_str_formatted']})
+        editions = build_editions({**kept_docs, **desired}, dates)
+        commits = publish_editions(db, editions)
+        print(f"🗞️  Edition manifests published for {', '.join(sorted(editions)) or 'no dates'} ({commits} batch commits).")
+    except Exception as e:
+        print(f" ❌ Failed to publish edition manifests: {e}"); traceback.print_exc()
+
+def publish_analysis_lookups(desired: dict[str, dict]):
+    """Lets describeimage answer from Firestore: the `image` URL of each of tonight's new docs → its analysis.
+
+    Entries older than ANALYSIS_LOOKUP_TTL_DAYS are pruned, so the collection only covers recent nights.
+    """
+    entries = {doc['image']: {'analysis': doc['analysis'], 'docId': doc_id, 'paperDate': doc.get('paperDate'),
+                              'source': 'nightly', 'updated': get_backends().store.SERVER_TIMESTAMP}
+               for doc_id, doc in desired.items() if doc['analysis'] not in (ANALYSIS_DEFERRED_TEXT, ANALYSIS_FAILED_TEXT)}
+    try:
+        commits = publish_analysis_lookup(get_backends().store, ANALYSIS_LOOKUP_COLLECTION_NAME, entries)
+        expired = prune_analysis_lookup(get_backends().store, ANALYSIS_LOOKUP_COLLECTION_NAME, ANALYSIS_LOOKUP_TTL_SECONDS)
+        print(f"🔗 Analysis lookup updated for {len(entries)} image URLs, {expired} expired removed ({commits} batch commits).")
+    except Exception as e: print(f" ❌ Failed to publish the analysis lookup: {e}")
+
+def process_items(items, manifest: ContentManifest | None = None, backends: Backends | None = None,
+                  phash_index: PerceptualIndex | None = None, ocr_index: OcrIndex | None = None, journal: RunJournal | None = None,
+                  download_workers: int = DOWNLOAD_WORKERS, analysis_workers: int = ANALYSIS_WORKERS,
+                  image_workers: int = IMAGE_WORKERS, upload_workers: int = UPLOAD_WORKERS):
+    """Runs every item through download → Gemini → Pillow/Blurhash → upload, then publishes.
+
+    Papers overlap across stages; each stage has its own bounded pool, and the
+    CPU-bound image stage runs in a process pool. With a manifest, papers whose
+    bytes haven't changed are skipped and fully published ones are recorded in it;
+    `phash_index` does the same for pages that only look the same (see download_item).
+    Newly published papers' OCR goes into `ocr_index`, saved by the caller.
+    Each paper's progress goes into `journal` as its stages finish; published
+    papers leave it, so after a crash it holds exactly what a resumed run can reuse.
+    The publish step swaps the collection over to this run's docs in one go.
+    `backends` replaces the Google ones (see set_backends).
+
+    Papers go in priority order under a DeadlineScheduler: as the deadline nears,
+    later papers get OCR only or cached results, and whatever finished is published.
+    Those papers aren't recorded in the manifest, so the next run completes them,
+    and neither are papers whose Gemini analysis or OCR failed.
+    """
+    global _scheduler
+    if backends is not None: set_backends(backends)
+    _scheduler = scheduler = DeadlineScheduler(concurrency=analysis_workers)
+    items = scheduler.prioritise(items)
+    paper_dates = {calculate_paper_iso_date(item.get('pubDate')) for item in items} - {None}
+    print(f"⏱️  {scheduler.remaining() / 60:.0f} minutes until the run deadline.")
+    db = get_backends().store
+    with instrumentation.span("firestore.list_documents"):
+        existing_doc_ids = list_document_ids(db, COLLECTION_NAME)
+    with instrumentation.span("details.load"):
+        load_newspaper_details()
+    pipeline = StagePipeline([
+        Stage("download", partial(download_item, manifest=manifest, existing_doc_ids=existing_doc_ids, scheduler=scheduler, phash_index=phash_index, journal=journal), download_workers),
+        Stage("analysis", partial(analyse_item, scheduler=scheduler, journal=journal), analysis_workers),
+        Stage("image", process_image_job, image_workers, use_processes=True),
+        Stage("upload", partial(upload_item, journal=journal), upload_workers),
+    ], label=lambda item: os.path.basename(item.get('link') or '') or item.get('title', '?'))
+    results = pipeline.run(items)
+    # --- STAGE 5: PUBLISH ---
+    desired = {doc_id: doc for result in results if result for doc_id, doc in result.get('documents', {}).items()}
+    kept = {doc_id: result for result in results if result and result.get('unchanged') for doc_id in result['doc_ids']}
+    keep = set(kept)
+    try:
+        print(f"\n📤 Publishing {len(desired)} documents…")
+        with instrumentation.span("publish.documents"): publish_documents(db, COLLECTION_NAME, desired, existing_doc_ids, keep)
+    except Exception as e:
+        print(f" ❌ Failed to PUBLISH documents to {COLLECTION_NAME}: {e}"); traceback.print_exc(); return results
+    # Papers missing an upload keep their entries, so a resumed run retries just that part.
+    if journal is not None: journal.published(result['image_src'] for result in results if result and result.get('complete', True))
+    with instrumentation.span("publish.editions"): publish_edition_manifests(desired, kept, paper_dates)
+    with instrumentation.span("publish.analysis_lookup"): publish_analysis_lookups(desired)
+    for result in results:
+        if not result or result.get('skipped'): continue
+        # Near-duplicates aren't recorded: they're matched afresh each run, so if their
+        # URL gets a new edition it's never mistaken for the page already published.
+        if (not result.get('unchanged') and result['complete'] and result['analysis_mode'] == FULL
+              and not extraction_failed(result.get('analysis_text'), result.get('ocr_data'))):
+            if manifest is not None: manifest.record(result['image_src'], result['sha256'], result['doc_ids'])
+            if phash_index is not None:
+                phash_index.record(result['paper_date_iso'] or 'undated', result['dhash'], result['thumb'], result['image_src'], result['title'], result['sha256'], result['doc_ids'])
+    if ocr_index is not None:
+        with instrumentation.span("ocr_index.update"):
+            for result in results:
+                if result and not result.get('unchanged') and not result.get('skipped'): index_ocr(ocr_index, result)
+    skipped = sum(1 for r in results if r and r.get('unchanged'))
+    dropped = sum(1 for r in results if r and r.get('skipped'))
+    instrumentation.count("pipeline.papers", sum(1 for r in results if r) - skipped - dropped, result="processed")
+    instrumentation.count("pipeline.papers", skipped, result="unchanged")
+    for reason in ('duplicate', 'placeholder'):
+        instrumentation.count("pipeline.papers", sum(1 for r in results if r and r.get('skipped') == reason), result=reason)
+    instrumentation.count("pipeline.papers", sum(1 for r in results if not r), result="failed")
+    print(f"\n📊 {sum(1 for r in results if r) - skipped - dropped} of {len(items)} papers processed, {skipped} unchanged, {dropped} duplicates/placeholders.")
+    return results
+
+def upload_items(items, backends: Backends | None = None, ocr_index_dir: str | None = None, resume: bool = False):
+    """Processes and publishes feed items, keeping the content manifest, Gemini cache and OCR index up to date.
+
+    With `resume`, papers an interrupted run already analysed or uploaded pick up from there.
+    """
+    if backends is not None: set_backends(backends)
+    journal = open_journal(resume)
+    with instrumentation.span("manifest.load"): manifest = load_manifest()
+    phash_index = load_phash_index()
+    with instrumentation.span("ocr_index.load"): ocr_index = open_ocr_index(ocr_index_dir)
+    print(f"   → {len(items)} items found. Processing…\n"); process_items(items, manifest=manifest, phash_index=phash_index, ocr_index=ocr_index, journal=journal)
+    manifest.prune(item.get('link') for item in items)
+    with instrumentation.span("manifest.save"): save_manifest(manifest)
+    with instrumentation.span("phash_index.save"):
+        save_phash_index(phash_index, {calculate_paper_iso_date(item.get('pubDate')) or 'undated' for item in items})
+    if ocr_index is not None:
+        with instrumentation.span("ocr_index.save"): save_ocr_index(ocr_index)
+    cache = get_gemini_cache()
+    if cache:
+        with instrumentation.span("gemini_cache.evict"): print(f"💾 Gemini cache: {cache.evict()} expired/overflow entries evicted.")
 
 def main():
-    print("🧹 Clearing Firestore collection…"); delete_all_documents()
-    print("\n🔄 Fetching feed…"); items = fetch_feed()
+    print("🔄 Fetching feed…"); items = fetch_feed()
     if not items: print("   → No items found in feed."); return
-    print(f"   → {len(items)} items found. Processing…\n"); process_items(items)
+    upload_items(items)
     print("\n✔️  Done.")
+    instrumentation.write_report(entry="upload")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
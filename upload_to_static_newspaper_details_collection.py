@@ -4,10 +4,11 @@
 # === WITH THE USER'S ORIGINAL, CURATED DATA RESTORED                             ===
 # ===================================================================================
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
 import os
 
+from publisher import commit_in_batches
+
 # --- Configuration ---
 # Get the directory where THIS script is located.
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -89,16 +90,44 @@ NEWSPAPER_DATA = {
     }
 }
 
+# --- How each paper appears in feed titles ---
+# Phrases are matched as whole words anywhere in a title, longest first. A single word
+# only matches when it is the whole title once filler like "The" or "front page" is
+# dropped, so "Times" and "The Times" are The Times but "Glasgow Times" is nobody.
+# Every key must be a document in NEWSPAPER_DATA above.
+TITLE_ALIASES = {
+    "sun": ["the sun", "sun on sunday", "sun"],
+    "mail": ["daily mail", "mail on sunday", "mail"],
+    "metro": ["metro"],
+    "mirror": ["daily mirror", "sunday mirror", "mirror"],
+    "times": ["the times", "sunday times", "times"],
+    "telegraph": ["daily telegraph", "sunday telegraph", "the telegraph", "telegraph"],
+    "express": ["daily express", "sunday express", "express"],
+    "star": ["daily star", "star"],
+    "i": ["i weekend", "i paper", "i"],
+    "guardian": ["the guardian", "guardian"],
+    "observer": ["the observer", "observer"],
+    "financial": ["financial times", "financial"],
+    "ft": ["ft weekend", "ft"],
+    "independent": ["the independent", "independent"],
+}
+
+
+def get_db():
+    """Connects to Firebase (once) and returns the Firestore client."""
+    # Imported here so newspaper_titles can read the data above without loading Firebase.
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
 
 def upload_details():
     """Connects to Firebase and uploads the newspaper data."""
     try:
-        # --- Initialize Firebase ---
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-            firebase_admin.initialize_app(cred)
-        
-        db = firestore.client()
+        db = get_db()
         collection_ref = db.collection(DETAILS_COLLECTION_NAME)
         
         print(f"Starting upload to '{DETAILS_COLLECTION_NAME}' collection...")
@@ -115,6 +144,34 @@ def upload_details():
         print("Please ensure your 'service-account.json' file is in the correct directory and has the right permissions.")
 
 
+def sync_details():
+    """Reads the collection once and writes only new, changed or removed papers, in batches."""
+    try:
+        db = get_db()
+        collection_ref = db.collection(DETAILS_COLLECTION_NAME)
+        existing = {doc.id: doc.to_dict() for doc in collection_ref.stream()}
+
+        operations = []
+        for doc_id, data in NEWSPAPER_DATA.items():
+            if existing.get(doc_id) != data:
+                operations.append(("set", collection_ref.document(doc_id), data))
+                print(f"  ✏️  {'Updating' if doc_id in existing else 'Creating'}: {doc_id}")
+        for doc_id in sorted(set(existing) - set(NEWSPAPER_DATA)):
+            operations.append(("delete", collection_ref.document(doc_id), None))
+            print(f"  🗑️  Removing: {doc_id}")
+
+        if not operations: print(f"\n✔️ '{DETAILS_COLLECTION_NAME}' is already in sync."); return
+        commits = commit_in_batches(db, operations)
+        print(f"\n✔️ Sync complete: {len(operations)} changes in {commits} batch commit(s).")
+
+    except Exception as e:
+        print(f"\n❌ An error occurred: {e}")
+        print("Please ensure your 'service-account.json' file is in the correct directory and has the right permissions.")
+
+
 # --- Main execution block ---
 if __name__ == "__main__":
-    upload_details()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Populate the newspaper_details collection.")
+    parser.add_argument("--sync", action="store_true", help="only write papers that are new, changed or removed, in batches")
+    args = parser.parse_args()
+    sync_details() if args.sync else upload_details()